@@ -0,0 +1,112 @@
+import asyncio
+import socket
+import threading
+import constant.NetworkConfig as Network
+import constant.SettingConstant as Setting
+from TcpSendReceiver import TcpSendReceiver
+
+class AsyncTcpSendReceiver(TcpSendReceiver):
+    # Same callback surface as TcpSendReceiver, but the socket is driven by an asyncio loop
+    # running on its own thread: connect() returns immediately, sends await writability
+    # instead of sleeping on EWOULDBLOCK, and disconnect() cancels the socket tasks.
+    def __init__(self, host, port, connection_callback, image_callback, text_callback, state_callback, command_callback):
+        super().__init__(host, port, connection_callback, image_callback, text_callback, state_callback, command_callback)
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = None
+        self.send_ready = None
+
+    def connect(self):
+        # The result is reported through connection_callback once the connection completes
+        self.decode_thread = threading.Thread(target=self.decode_frames)
+        self.decode_thread.start()
+        self.loop_thread = threading.Thread(target=self.run_loop)
+        self.loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self.connect_async(), self.loop)
+        return self.connected
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        if self.client_socket is not None:
+            self.client_socket.close()
+            self.client_socket = None
+        self.loop.close()
+
+    async def connect_async(self):
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        self.client_socket.setblocking(False)
+        self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            await asyncio.wait_for(self.loop.sock_connect(self.client_socket, (self.host, self.port)), Network.CONNECT_TIMEOUT_SEC)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.disconnect()
+            return
+        # Everything send_message relies on exists before the flag lets callers in
+        self.send_ready = asyncio.Event()
+        self.loop.create_task(self.recv_async())
+        self.loop.create_task(self.send_async())
+        self.connected = True
+        self.connection_callback(Network.NETWORK_CONNECTED)
+
+    def disconnect(self):
+        with self.disconnect_lock:
+            if self.disconnecting:
+                return
+            self.disconnecting = True
+        self.connected = False
+        self.stop_event.set()
+        with self.frame_condition:
+            self.frame_condition.notify_all()
+        try:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        except RuntimeError:
+            pass
+        if self.state_callback:
+            self.state_callback(Setting.SYSTEM_MODE_UNKNOWN)
+        if self.connection_callback:
+            self.connection_callback(Network.NETWORK_DISCONNECTED)
+        self.image_callback = None
+        self.text_callback = None
+        self.state_callback = None
+        if self.decode_thread is not None:
+            self.decode_thread.join()
+        if self.loop_thread is not None and self.loop_thread is not threading.current_thread():
+            self.loop_thread.join()
+
+    def notify_sender(self):
+        # Messages are encoded by the caller as in TcpSendReceiver, the loop only gets woken up.
+        # The backlog is capped by send_message, a full buffer is refused there and never waits here.
+        send_ready = self.send_ready
+        if send_ready is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(send_ready.set)
+        except RuntimeError:
+            pass
+
+    async def send_async(self):
+        try:
+            while True:
+                await self.send_ready.wait()
+                self.send_ready.clear()
+                encoder = self.take_send_buffer()
+                if encoder.size == 0:
+                    continue
+                await self.loop.sock_sendall(self.client_socket, encoder.get_view())
+                encoder.clear()
+        except OSError as e:
+            self.disconnect()
+
+    async def recv_async(self):
+        try:
+            while True:
+                nbytes = await self.loop.sock_recv_into(self.client_socket, self.message_decoder.get_receive_view())
+                if nbytes == 0:
+                    raise ConnectionResetError("Socket connection closed by server")
+                self.process_received(nbytes)
+        except OSError as e:
+            self.disconnect()
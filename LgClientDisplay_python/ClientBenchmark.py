@@ -0,0 +1,409 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import sys
+import json
+import time
+import struct
+import argparse
+import resource
+import tempfile
+import threading
+import cv2
+import numpy as np
+from PyQt5 import QtWidgets, QtCore
+import constant.NetworkConfig as Network
+from DemoCannonServer import DemoCannonServer, load_frames
+from TcpSendReceiver import TcpSendReceiver
+from LgClientModel import LgClientModel
+from LgClientDisplay import LgClientDisplay
+from VideoRecorder import VideoRecorder
+from FrameMetrics import FRAME_MARK_RECEIVE_END, FRAME_MARK_DECODE_END, FRAME_MARK_EMIT, FRAME_MARK_DELIVER, \
+                         FRAME_MARK_RENDER_START, FRAME_MARK_PAINT, FRAME_MARK_RECORD_ENQUEUE, FRAME_MARK_RECORD_WRITTEN
+from constant.DisplayConstant import RECORD_QUEUE_SIZE, RECORD_QUEUE_POLICY, RECORD_POLICY_LIST, RECORD_MODE, RECORD_MODE_LIST, \
+                                    RECORD_MODE_REENCODE
+
+# End-to-end client benchmark: an in-process DemoCannonServer streams synthetic JPEG frames into the real
+# TcpSendReceiver, LgClientModel, LgClientDisplay (offscreen) and VideoRecorder, and every frame is traced
+# through the pipeline by a sequence number appended after the JPEG end marker, which decoders ignore.
+# The client stamps its stages through the frame_info it passes along, so a BenchmarkFrameTrace rides
+# in that slot and forwards to the real FrameInfo when --frame-metrics is on.
+# The server shares the process, so the CPU figures include its (small) send cost.
+# Results are compared with benchmark_baseline.json by profile. --check fails when the profile has no baseline,
+# and --save-baseline stores the run for its profile.
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+FRAME_SEQUENCE_TRAILER = struct.Struct('!Q')
+SYNTHETIC_FRAME_COUNT = 30
+
+# (stage name, start mark, end mark)
+BENCHMARK_STAGE_LIST = [
+    ("network", "send", FRAME_MARK_RECEIVE_END),
+    ("decode_wait", FRAME_MARK_RECEIVE_END, "decode_start"),
+    ("decode", "decode_start", FRAME_MARK_DECODE_END),
+    ("signal", FRAME_MARK_EMIT, FRAME_MARK_DELIVER),
+    ("render_wait", FRAME_MARK_DELIVER, FRAME_MARK_RENDER_START),
+    ("render", FRAME_MARK_RENDER_START, FRAME_MARK_PAINT),
+    ("end_to_end", "send", FRAME_MARK_PAINT),
+    ("record", FRAME_MARK_RECORD_ENQUEUE, FRAME_MARK_RECORD_WRITTEN),
+]
+BENCHMARK_PERCENTILE_LIST = [50, 90, 95, 99]
+
+# Regression thresholds, relative tolerance comes from --tolerance
+LATENCY_SLACK_MS = 0.5
+DROP_RATE_SLACK = 0.01
+
+def read_sequence(data):
+    return FRAME_SEQUENCE_TRAILER.unpack_from(data, len(data) - FRAME_SEQUENCE_TRAILER.size)[0]
+
+def make_synthetic_frames(count, width, height, quality):
+    # Gradient background with a moving target and noise, so JPEG size and decode cost resemble camera frames
+    rng = np.random.default_rng(0)
+    background = np.empty((height, width, 3), np.uint8)
+    background[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+    background[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    background[..., 2] = 96
+    frames = []
+    for index in range(count):
+        image = background.copy()
+        center = (int(width * index / count), height // 2)
+        cv2.circle(image, center, max(4, height // 8), (0, 0, 255), -1)
+        cv2.putText(image, f"{index:03d}", (16, height - 16), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        cv2.add(image, rng.integers(0, 24, image.shape, dtype=np.uint8), image)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            frames.append(encoded.tobytes())
+    return frames
+
+def summarize_latency(samples):
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples) * 1000.0
+    summary = {"count": len(samples), "mean": round(float(values.mean()), 3)}
+    for percentile, value in zip(BENCHMARK_PERCENTILE_LIST, np.percentile(values, BENCHMARK_PERCENTILE_LIST)):
+        summary[f"p{percentile}"] = round(float(value), 3)
+    summary["max"] = round(float(values.max()), 3)
+    return summary
+
+class FrameTimeline:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.marks = {}
+
+    def mark(self, sequence, stage):
+        now = time.perf_counter()
+        with self.lock:
+            self.marks.setdefault(sequence, {})[stage] = now
+
+    def get_stage_samples(self, start_time, end_time):
+        # Only frames sent inside the measurement window are counted
+        samples = {name: [] for name, _, _ in BENCHMARK_STAGE_LIST}
+        with self.lock:
+            marks = list(self.marks.values())
+        for frame_marks in marks:
+            send_time = frame_marks.get("send")
+            if send_time is None or not start_time <= send_time < end_time:
+                continue
+            for name, start, end in BENCHMARK_STAGE_LIST:
+                if start in frame_marks and end in frame_marks:
+                    samples[name].append(frame_marks[end] - frame_marks[start])
+        return samples
+
+class BenchmarkServer(DemoCannonServer):
+    def __init__(self, timeline, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeline = timeline
+        self.next_sequence = 0
+
+    def send_message(self, msg_type, msg_data):
+        if msg_type == Network.MT_IMAGE:
+            sequence = self.next_sequence
+            self.next_sequence += 1
+            msg_data = msg_data + FRAME_SEQUENCE_TRAILER.pack(sequence)
+            self.timeline.mark(sequence, "send")
+        return super().send_message(msg_type, msg_data)
+
+class BenchmarkFrameTrace:
+    __slots__ = ("timeline", "sequence", "frame_info")
+
+    def __init__(self, timeline, sequence, frame_info):
+        self.timeline = timeline
+        self.sequence = sequence
+        self.frame_info = frame_info
+
+    def mark(self, name):
+        self.timeline.mark(self.sequence, name)
+        if self.frame_info is not None:
+            self.frame_info.mark(name)
+
+class BenchmarkReceiver(TcpSendReceiver):
+    def __init__(self, timeline, *args):
+        super().__init__(*args)
+        self.timeline = timeline
+
+    def start_frame_info(self, msg_type):
+        # The sequence number is only known once the payload is in, see dispatch_message
+        frame_info = super().start_frame_info(msg_type)
+        if msg_type != Network.MT_IMAGE:
+            return frame_info
+        return BenchmarkFrameTrace(self.timeline, None, frame_info)
+
+    def dispatch_message(self, msg_type, msg_data):
+        if msg_type == Network.MT_IMAGE:
+            self.frame_info.sequence = read_sequence(msg_data)
+            self.frame_info.mark(FRAME_MARK_RECEIVE_END)
+        super().dispatch_message(msg_type, msg_data)
+
+    def end_frame_info(self, frame_info):
+        self.frame_info = frame_info
+
+    def decode_image(self, img_data, frame_info=None):
+        frame_info.mark("decode_start")
+        super().decode_image(img_data, frame_info)
+
+class ClientBenchmark:
+    def __init__(self, args, frames):
+        self.args = args
+        self.timeline = FrameTimeline()
+        self.server = BenchmarkServer(self.timeline, 0, frames, args.fps, args.text_interval, args.state_interval)
+        first_frame = cv2.imdecode(np.frombuffer(frames[0], np.uint8), cv2.IMREAD_COLOR)
+        self.frame_size = (first_frame.shape[1], first_frame.shape[0])
+        self.snapshots = {}
+
+    def run(self):
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+        self.server.listen()
+        server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        server_thread.start()
+
+        self.model = LgClientModel()
+        self.receiver = BenchmarkReceiver(self.timeline, "127.0.0.1", self.server.port, lambda connected: None,
+                                          self.update_image, lambda text: None, lambda state: None, lambda cmd: None)
+        self.receiver.set_frame_metrics(self.model.frame_metrics)
+        self.model.frame_metrics.set_enabled(self.args.frame_metrics)
+        self.model.video_size_signal.connect(self.update_video_size)
+        self.ui = LgClientDisplay(self.model)
+        self.model.process_image_signal.connect(self.ui.display_image)
+        self.ui.show()
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.recorder = VideoRecorder(lambda fileName: None, self.args.record_queue_size, self.args.record_policy,
+                                          self.args.record_mode)
+            self.recorder.directory = directory
+            self.recorder.start()
+            if self.args.record:
+                self.recorder.set_recording(True, self.frame_size)
+                if self.recorder.is_passthrough():
+                    self.receiver.set_jpeg_callback(self.recorder.enqueue_record_jpeg)
+            if self.needs_full_decode():
+                self.receiver.set_decode_size(None)
+
+            if not self.receiver.connect():
+                raise ConnectionError(f"Could not connect to the benchmark server on port {self.server.port}")
+            warmup_ms = int(self.args.warmup * 1000)
+            QtCore.QTimer.singleShot(warmup_ms, lambda: self.take_snapshot("start"))
+            QtCore.QTimer.singleShot(warmup_ms + int(self.args.duration * 1000), lambda: self.finish(app))
+            app.exec_()
+
+            self.receiver.disconnect()
+            self.server.shutdown()
+            self.recorder.enqueue_stop_record_video()
+            self.recorder.enqueue_exit()
+            self.recorder.wait()
+        self.ui.hide()
+        return self.build_report()
+
+    def take_snapshot(self, name):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.snapshots[name] = {
+            "time": time.perf_counter(),
+            "cpu_user": usage.ru_utime,
+            "cpu_system": usage.ru_stime,
+            "sent": self.server.sent_frames,
+            "frame_stats": self.receiver.get_frame_stats(),
+            "render_stats": self.ui.renderScheduler.get_stats(),
+            "record_stats": self.recorder.get_record_stats(),
+        }
+
+    def finish(self, app):
+        self.take_snapshot("end")
+        app.quit()
+
+    # Mirrors LgClientController.update_image on the decode thread
+    def update_image(self, image, frame_info=None):
+        frame_info.mark(FRAME_MARK_EMIT)
+        self.model.process_image_signal.emit(image, frame_info)
+        if self.recorder.get_recording() and not self.recorder.is_passthrough():
+            self.recorder.enqueue_record_video(image, frame_info)
+
+    # Mirrors LgClientController.apply_decode_size
+    def needs_full_decode(self):
+        return self.args.full_decode or (self.args.record and self.args.record_mode == RECORD_MODE_REENCODE)
+
+    def update_video_size(self, width, height):
+        if not self.needs_full_decode():
+            self.receiver.set_decode_size((width, height))
+
+    def build_report(self):
+        start, end = self.snapshots["start"], self.snapshots["end"]
+        elapsed = end["time"] - start["time"]
+        received = end["frame_stats"][0] - start["frame_stats"][0]
+        decoded = end["frame_stats"][1] - start["frame_stats"][1]
+        decode_dropped = end["frame_stats"][2] - start["frame_stats"][2]
+        rendered = end["render_stats"][1] - start["render_stats"][1]
+        render_dropped = end["render_stats"][2] - start["render_stats"][2]
+        written = end["record_stats"][1] - start["record_stats"][1]
+        record_dropped = end["record_stats"][2] - start["record_stats"][2]
+        sent = end["sent"] - start["sent"]
+        cpu_user = end["cpu_user"] - start["cpu_user"]
+        cpu_system = end["cpu_system"] - start["cpu_system"]
+        samples = self.timeline.get_stage_samples(start["time"], end["time"])
+
+        return {
+            "profile": get_profile_name(self.args),
+            "config": {
+                "width": self.frame_size[0],
+                "height": self.frame_size[1],
+                "fps": self.args.fps,
+                "quality": self.args.quality,
+                "duration": round(elapsed, 3),
+                "record": self.args.record,
+                "record_mode": self.args.record_mode,
+                "record_policy": self.args.record_policy,
+                "record_queue_size": self.args.record_queue_size,
+                "full_decode": self.args.full_decode,
+                "frame_metrics": self.args.frame_metrics,
+                "frame_bytes": int(np.mean([len(frame) for frame in self.server.frames])),
+            },
+            "fps": {
+                "sent": round(sent / elapsed, 2),
+                "received": round(received / elapsed, 2),
+                "decoded": round(decoded / elapsed, 2),
+                "rendered": round(rendered / elapsed, 2),
+                "recorded": round(written / elapsed, 2),
+            },
+            "dropped_frames": {
+                "decode": decode_dropped,
+                "render": render_dropped,
+                "record": record_dropped,
+                "rate": round((decode_dropped + render_dropped) / max(1, received), 4),
+            },
+            "latency_ms": {name: summarize_latency(samples[name]) for name, _, _ in BENCHMARK_STAGE_LIST},
+            "cpu_seconds": {
+                "user": round(cpu_user, 3),
+                "system": round(cpu_system, 3),
+                "total": round(cpu_user + cpu_system, 3),
+            },
+            "cpu_percent": round((cpu_user + cpu_system) / elapsed * 100.0, 1),
+            # ru_maxrss is reported in KiB on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+            # In-app FrameMetrics view of the same run, empty unless --frame-metrics is given
+            "frame_metrics": self.model.frame_metrics.get_summary() if self.args.frame_metrics else {},
+        }
+
+def get_profile_name(args):
+    name = f"{args.width}x{args.height}@{args.fps:g}"
+    if args.record:
+        name += f"-record-{args.record_mode}"
+    if args.full_decode:
+        name += "-fulldecode"
+    if args.frame_metrics:
+        name += "-metrics"
+    return name
+
+def compare_with_baseline(report, baseline, tolerance):
+    regressions = []
+    for stage, base_stats in baseline.get("latency_ms", {}).items():
+        stats = report["latency_ms"].get(stage, {})
+        for key in ("p50", "p95", "p99"):
+            if key not in base_stats or key not in stats:
+                continue
+            limit = base_stats[key] * (1 + tolerance) + LATENCY_SLACK_MS
+            if stats[key] > limit:
+                regressions.append(f"latency {stage} {key} {stats[key]:.3f} ms > {limit:.3f} ms")
+    for key in ("received", "decoded", "rendered", "recorded"):
+        base_value = baseline.get("fps", {}).get(key, 0)
+        limit = base_value * (1 - tolerance)
+        if report["fps"][key] < limit:
+            regressions.append(f"fps {key} {report['fps'][key]:.2f} < {limit:.2f}")
+    base_rate = baseline.get("dropped_frames", {}).get("rate")
+    if base_rate is not None:
+        limit = base_rate * (1 + tolerance) + DROP_RATE_SLACK
+        if report["dropped_frames"]["rate"] > limit:
+            regressions.append(f"drop rate {report['dropped_frames']['rate']:.4f} > {limit:.4f}")
+    for key in ("cpu_percent", "peak_rss_mb"):
+        if key in baseline:
+            limit = baseline[key] * (1 + tolerance)
+            if report[key] > limit:
+                regressions.append(f"{key} {report[key]:.1f} > {limit:.1f}")
+    return regressions
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+def save_baseline(path, report):
+    baselines = load_baselines(path)
+    baselines[report["profile"]] = report
+    with open(path, "w") as file:
+        json.dump(baselines, file, indent=2, sort_keys=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the LG client receive, display and record path")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds after the warmup")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds excluded from the measurement")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--images", nargs="*", help="glob patterns of JPEG frames to replay instead of synthetic frames")
+    parser.add_argument("--text-interval", type=float, default=0, help="seconds between injected texts, 0 disables")
+    parser.add_argument("--state-interval", type=float, default=0, help="seconds between repeated MT_STATE messages, 0 disables")
+    parser.add_argument("--record", action="store_true", help="record every frame with VideoRecorder while measuring")
+    parser.add_argument("--record-mode", choices=RECORD_MODE_LIST, default=RECORD_MODE)
+    parser.add_argument("--record-policy", choices=RECORD_POLICY_LIST, default=RECORD_QUEUE_POLICY)
+    parser.add_argument("--record-queue-size", type=int, default=RECORD_QUEUE_SIZE)
+    parser.add_argument("--full-decode", action="store_true", help="decode at source size instead of the display size")
+    parser.add_argument("--frame-metrics", action="store_true", help="enable the in-app per-frame instrumentation")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="JSON file of stored baselines keyed by profile")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline of its profile")
+    parser.add_argument("--check", action="store_true", help="fail when no baseline is stored for this profile")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression against the baseline")
+    args = parser.parse_args()
+
+    if args.images:
+        frames = load_frames(args.images, args.width, args.height, args.quality)
+    else:
+        frames = make_synthetic_frames(SYNTHETIC_FRAME_COUNT, args.width, args.height, args.quality)
+    if not frames:
+        parser.error("no frames found for the given --images patterns")
+
+    report = ClientBenchmark(args, frames).run()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, report)
+        print(f"Baseline for {report['profile']} saved to {args.baseline}", file=sys.stderr)
+        return 0
+    baseline = load_baselines(args.baseline).get(report["profile"])
+    if baseline is None:
+        if args.check:
+            # A regression check without a baseline would always pass
+            print(f"No baseline for {report['profile']} in {args.baseline}, run with --save-baseline first", file=sys.stderr)
+            return 2
+        print(f"No baseline for {report['profile']} in {args.baseline}, comparison skipped", file=sys.stderr)
+        return 0
+    regressions = compare_with_baseline(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
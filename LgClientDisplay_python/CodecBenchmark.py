@@ -0,0 +1,199 @@
+import sys
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+import constant.NetworkConfig as Network
+import constant.SettingConstant as Setting
+from MessageCodec import MessageEncoder, MessageDecoder, decode_payload, encode_payload
+
+# Receive-path benchmark of the message codec: a sender thread writes bursts of small MT_TEXT/MT_STATE messages,
+# optionally with an MT_IMAGE between bursts, into a socketpair. The same stream is read once with the previous
+# per-message path (header recv, then payload recv, then struct/int.from_bytes decoding) and once with
+# MessageDecoder, which splits every message a single recv returns. The send side compares building each message
+# with struct.pack and concatenation against packing them into one reused MessageEncoder buffer.
+
+BENCHMARK_TEXT = "[title]Simulated status 000\n"
+BENCHMARK_STATE = Setting.SYSTEM_MODE_SAFE
+
+def build_message_list(count, burst, image_every, image_bytes):
+    # (msg_type, value) in send order, grouped into bursts that go out with one sendall each
+    bursts = []
+    image = bytes(image_bytes)
+    sent = 0
+    while sent < count:
+        messages = []
+        for index in range(min(burst, count - sent)):
+            if index % 2:
+                messages.append((Network.MT_STATE, BENCHMARK_STATE))
+            else:
+                messages.append((Network.MT_TEXT, BENCHMARK_TEXT))
+        sent += len(messages)
+        if image_every and len(bursts) % image_every == image_every - 1:
+            messages.append((Network.MT_IMAGE, image))
+        bursts.append(messages)
+    return bursts
+
+def encode_legacy(messages):
+    # The framing TcpSendReceiver and DemoCannonServer used before MessageCodec
+    encoded = []
+    for msg_type, value in messages:
+        if msg_type == Network.MT_STATE:
+            msg_data = struct.pack('!I', value)
+        elif msg_type == Network.MT_TEXT:
+            msg_data = value.encode() + b'\0'
+        else:
+            msg_data = value
+        encoded.append(struct.pack('!II', len(msg_data), msg_type) + msg_data)
+    return b"".join(encoded)
+
+def encode_codec(encoder, messages):
+    encoder.clear()
+    for msg_type, value in messages:
+        encoder.add(msg_type, value)
+    return encoder.get_view()
+
+def send_stream(sock, payloads):
+    for payload in payloads:
+        sock.sendall(payload)
+    sock.shutdown(socket.SHUT_WR)
+
+class LegacyReader:
+    # Header and payload read separately into reused buffers, the path this replaced
+    def __init__(self, sock):
+        self.sock = sock
+        self.header_buffer = bytearray(Network.MSG_HEADER_SIZE)
+        self.header_view = memoryview(self.header_buffer)
+        self.recv_buffer = bytearray(Network.RECV_BUFFER_INITIAL_SIZE)
+        self.recv_view = memoryview(self.recv_buffer)
+        self.recv_calls = 0
+
+    def recv_into_buffer(self, view, size):
+        received = 0
+        while received < size:
+            nbytes = self.sock.recv_into(view[received:size], size - received)
+            self.recv_calls += 1
+            if nbytes == 0:
+                return False
+            received += nbytes
+        return True
+
+    def read_all(self):
+        count = 0
+        while self.recv_into_buffer(self.header_view, Network.MSG_HEADER_SIZE):
+            msg_len, msg_type = struct.unpack_from('!II', self.header_buffer)
+            if msg_len > len(self.recv_buffer):
+                self.recv_buffer = bytearray(msg_len * 2)
+                self.recv_view = memoryview(self.recv_buffer)
+            msg_data = self.recv_view[:msg_len]
+            if not self.recv_into_buffer(msg_data, msg_len):
+                break
+            if msg_type == Network.MT_STATE:
+                int.from_bytes(msg_data, byteorder='big')
+            elif msg_type == Network.MT_TEXT:
+                bytes(msg_data).decode()
+            count += 1
+        return count
+
+class CodecReader:
+    def __init__(self, sock):
+        self.sock = sock
+        self.decoder = MessageDecoder()
+        self.recv_calls = 0
+
+    def read_all(self):
+        count = 0
+        decoder = self.decoder
+        while True:
+            nbytes = self.sock.recv_into(decoder.get_receive_view())
+            self.recv_calls += 1
+            if nbytes == 0:
+                return count
+            decoder.commit(nbytes)
+            for msg_type, msg_data in decoder.read_messages():
+                if msg_type != Network.MT_IMAGE:
+                    decode_payload(msg_type, msg_data)
+                count += 1
+
+def run_receive(reader_class, payloads):
+    sender, receiver = socket.socketpair()
+    reader = reader_class(receiver)
+    thread = threading.Thread(target=send_stream, args=(sender, payloads))
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    thread.start()
+    count = reader.read_all()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    thread.join()
+    sender.close()
+    receiver.close()
+    return {
+        "messages": count,
+        "seconds": round(elapsed, 4),
+        "messages_per_second": round(count / elapsed),
+        "recv_calls": reader.recv_calls,
+        "cpu_seconds": round(cpu, 4),
+    }
+
+def run_encode(bursts, repeat):
+    encoder = MessageEncoder()
+    legacy_best = codec_best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for messages in bursts:
+            encode_legacy(messages)
+        legacy_best = min(legacy_best, time.perf_counter() - start)
+        start = time.perf_counter()
+        for messages in bursts:
+            encode_codec(encoder, messages)
+        codec_best = min(codec_best, time.perf_counter() - start)
+    count = sum(len(messages) for messages in bursts)
+    return {
+        "legacy_us_per_message": round(legacy_best / count * 1e6, 3),
+        "codec_us_per_message": round(codec_best / count * 1e6, 3),
+        "speedup": round(legacy_best / codec_best, 2),
+    }
+
+def check_stream(bursts):
+    # Both encoders have to produce the same bytes, and encode_payload has to agree with them
+    encoder = MessageEncoder()
+    for messages in bursts:
+        if encode_legacy(messages) != bytes(encode_codec(encoder, messages)):
+            return False
+        for msg_type, value in messages:
+            if msg_type != Network.MT_IMAGE and encode_legacy([(msg_type, value)])[Network.MSG_HEADER_SIZE:] != encode_payload(msg_type, value):
+                return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the message codec against the per-message receive path")
+    parser.add_argument("--messages", type=int, default=200000, help="small messages sent per run")
+    parser.add_argument("--burst", type=int, default=16, help="small messages written with one sendall")
+    parser.add_argument("--image-every", type=int, default=0, help="append an MT_IMAGE to every n-th burst, 0 disables")
+    parser.add_argument("--image-bytes", type=int, default=60 * 1024)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per path, the fastest is reported")
+    args = parser.parse_args()
+
+    bursts = build_message_list(args.messages, args.burst, args.image_every, args.image_bytes)
+    if not check_stream(bursts):
+        print("MessageEncoder output differs from the legacy framing", file=sys.stderr)
+        return 1
+    payloads = [encode_legacy(messages) for messages in bursts]
+    receive = {}
+    for name, reader_class in (("per_message", LegacyReader), ("stream_decoder", CodecReader)):
+        runs = [run_receive(reader_class, payloads) for _ in range(args.repeat)]
+        receive[name] = min(runs, key=lambda run: run["seconds"])
+    report = {
+        "config": vars(args),
+        "receive": receive,
+        "receive_speedup": round(receive["per_message"]["seconds"] / receive["stream_decoder"]["seconds"], 2),
+        "encode": run_encode(bursts, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
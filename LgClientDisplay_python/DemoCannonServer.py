@@ -0,0 +1,256 @@
+import os
+import glob
+import time
+import socket
+import string
+import argparse
+import threading
+import cv2
+import constant.NetworkConfig as Network
+import constant.SettingConstant as Setting
+from constant.DisplayConstant import HIT_TEXT, MISS_TEXT, SERVER_MESSAGE_TYPE_TITLE
+from MessageCodec import MESSAGE_HEADER, encode_payload, decode_payload, pack_message
+
+# Headless stand-in for DemoCannon.cpp speaking the Message.h protocol, for load and latency
+# benchmarking of the client on a single machine without the Raspberry Pi.
+
+BASE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_IMAGE_PATTERNS = [os.path.join(BASE_DIRECTORY, "TfLite-2.17", "Data", "Capture*.jpg"),
+                          os.path.join(BASE_DIRECTORY, "Targets", "T*.jpg")]
+
+# Text prefix of the command receipt echo: [ack]<msg type>:<payload hex>:<receive time in ns>
+SERVER_MESSAGE_TYPE_ACK = "[ack]"
+
+# Same obfuscation DemoCannon.cpp uses for the pre-arm code
+PRE_ARM_DECODE = bytes([0x61, 0x60, 0x76, 0x75, 0x67, 0x7b, 0x72, 0x7c])
+PRE_ARM_DECODED_TEXT = b"PREARMED"
+MODE_MASK = 0x0F
+
+class DemoCannonServer:
+    def __init__(self, port, frames, fps, text_interval=0, state_interval=0, engage_interval=1.0, echo_commands=False):
+        self.port = port
+        self.frames = frames
+        self.fps = fps
+        self.text_interval = text_interval
+        self.state_interval = state_interval
+        self.engage_interval = engage_interval
+        self.echo_commands = echo_commands
+        self.server_socket = None
+        self.client_socket = None
+        self.send_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.connected = threading.Event()
+        self.system_state = Setting.SYSTEM_MODE_SAFE
+        self.algorithm = Setting.CMD_USE_OPENCV
+        self.target_order = ""
+        self.sent_frames = 0
+        self.sent_bytes = 0
+
+    def listen(self):
+        # Binding separately lets an embedded server report its ephemeral port before accepting
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(("", self.port))
+        self.server_socket.listen(1)
+        self.port = self.server_socket.getsockname()[1]
+        print(f"DemoCannonServer listening on port {self.port} with {len(self.frames)} frames at {self.fps} fps")
+
+    def serve_forever(self):
+        if self.server_socket is None:
+            self.listen()
+        while not self.stop_event.is_set():
+            try:
+                client_socket, address = self.server_socket.accept()
+            except OSError:
+                break
+            print(f"Client connected from {address[0]}")
+            self.handle_client(client_socket)
+            print("Client disconnected")
+
+    def shutdown(self):
+        self.stop_event.set()
+        self.close_client()
+        if self.server_socket is not None:
+            self.server_socket.close()
+
+    def handle_client(self, client_socket):
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.client_socket = client_socket
+        self.connected.set()
+        self.system_state = Setting.SYSTEM_MODE_SAFE
+        self.send_state()
+        self.send_message(Network.MT_COMMANDS, encode_payload(Network.MT_COMMANDS, self.algorithm))
+
+        workers = [threading.Thread(target=self.image_loop, daemon=True)]
+        if self.text_interval > 0:
+            workers.append(threading.Thread(target=self.text_loop, daemon=True))
+        if self.state_interval > 0:
+            workers.append(threading.Thread(target=self.state_loop, daemon=True))
+        workers.append(threading.Thread(target=self.engage_loop, daemon=True))
+        for worker in workers:
+            worker.start()
+        self.recv_loop()
+        self.close_client()
+        for worker in workers:
+            worker.join()
+
+    def close_client(self):
+        self.connected.clear()
+        client_socket = self.client_socket
+        self.client_socket = None
+        if client_socket is not None:
+            try:
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client_socket.close()
+
+    def send_message(self, msg_type, msg_data):
+        client_socket = self.client_socket
+        if client_socket is None:
+            return False
+        try:
+            with self.send_lock:
+                client_socket.sendall(pack_message(msg_type, msg_data))
+        except OSError:
+            self.connected.clear()
+            return False
+        return True
+
+    def send_text(self, text):
+        # DemoCannon.cpp includes the terminating NUL in the text length
+        return self.send_message(Network.MT_TEXT, encode_payload(Network.MT_TEXT, text))
+
+    def send_state(self):
+        return self.send_message(Network.MT_STATE, encode_payload(Network.MT_STATE, self.system_state))
+
+    def image_loop(self):
+        interval = 1.0 / self.fps
+        next_time = time.monotonic()
+        index = 0
+        while self.connected.is_set() and not self.stop_event.is_set():
+            frame = self.frames[index % len(self.frames)]
+            if not self.send_message(Network.MT_IMAGE, frame):
+                break
+            self.sent_frames += 1
+            self.sent_bytes += len(frame)
+            index += 1
+            # Pace by absolute deadlines so a slow send does not lower the average rate
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.monotonic()
+
+    def text_loop(self):
+        count = 0
+        while self.connected.is_set() and not self.stop_event.wait(self.text_interval):
+            count += 1
+            self.send_text(f"{SERVER_MESSAGE_TYPE_TITLE}Simulated status {count}")
+
+    def state_loop(self):
+        while self.connected.is_set() and not self.stop_event.wait(self.state_interval):
+            self.send_state()
+
+    def engage_loop(self):
+        # In auto engage, report a hit or miss for each target in order, then fall back to pre-arm
+        while self.connected.is_set() and not self.stop_event.wait(self.engage_interval):
+            if self.system_state & MODE_MASK != Setting.SYSTEM_MODE_AUTO_ENGAGE or not self.target_order:
+                continue
+            target = self.target_order[0]
+            self.target_order = self.target_order[1:]
+            # Targets are single digits, anything else in the order is skipped
+            if target in string.digits:
+                result = HIT_TEXT if int(target) % 2 else MISS_TEXT
+                self.send_text(f"{result} the target & Target No : {target}\n")
+            if not self.target_order:
+                self.system_state = Setting.SYSTEM_MODE_PRE_ARM
+                self.send_state()
+
+    def recv_exactly(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.client_socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionResetError("Client closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def recv_loop(self):
+        while self.connected.is_set() and not self.stop_event.is_set():
+            try:
+                msg_len, msg_type = MESSAGE_HEADER.unpack(self.recv_exactly(MESSAGE_HEADER.size))
+                msg_data = self.recv_exactly(msg_len)
+            except (OSError, AttributeError):
+                break
+            received_ns = time.monotonic_ns()
+            self.process_message(msg_type, msg_data)
+            if self.echo_commands:
+                self.send_text(f"{SERVER_MESSAGE_TYPE_ACK}{msg_type}:{msg_data.hex()}:{received_ns}")
+
+    def process_message(self, msg_type, msg_data):
+        mode = self.system_state & MODE_MASK
+        if msg_type == Network.MT_COMMANDS:
+            command = msg_data[0]
+            if command in (Setting.CMD_USE_OPENCV, Setting.CMD_USE_TF) and mode == Setting.SYSTEM_MODE_SAFE:
+                self.algorithm = command
+                self.send_message(Network.MT_COMMANDS, encode_payload(Network.MT_COMMANDS, self.algorithm))
+        elif msg_type == Network.MT_TARGET_SEQUENCE:
+            self.target_order = decode_payload(msg_type, msg_data)
+        elif msg_type == Network.MT_PREARM:
+            code = decode_payload(msg_type, msg_data).encode('utf-8')
+            if mode == Setting.SYSTEM_MODE_SAFE and len(code) == len(PRE_ARM_DECODE):
+                if bytes(a ^ b for a, b in zip(code, PRE_ARM_DECODE)) == PRE_ARM_DECODED_TEXT:
+                    self.system_state = Setting.SYSTEM_MODE_PRE_ARM
+                    self.send_state()
+        elif msg_type == Network.MT_STATE_CHANGE_REQ:
+            state = decode_payload(msg_type, msg_data)
+            if state & MODE_MASK in Setting.SYSTEM_MODE_LIST:
+                self.system_state = state
+            self.send_state()
+        elif msg_type == Network.MT_CONFIG:
+            config = decode_payload(msg_type, msg_data)
+            self.send_text(f"{SERVER_MESSAGE_TYPE_TITLE}Config {config}")
+
+def load_frames(patterns, width, height, quality):
+    # Frames are re-encoded once up front so the send loop only copies bytes
+    frames = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+            if width > 0 and height > 0:
+                image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if ok:
+                frames.append(encoded.tobytes())
+    return frames
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless DemoCannon stand-in for client benchmarking")
+    parser.add_argument("--port", type=int, default=Network.REMOTE_PORT_NUM)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--images", nargs="*", default=DEFAULT_IMAGE_PATTERNS, help="glob patterns of JPEG frames to replay")
+    parser.add_argument("--text-interval", type=float, default=0, help="seconds between injected [title] texts, 0 disables")
+    parser.add_argument("--state-interval", type=float, default=0, help="seconds between repeated MT_STATE messages, 0 disables")
+    parser.add_argument("--engage-interval", type=float, default=1.0, help="seconds between hit/miss reports in auto engage")
+    parser.add_argument("--echo-commands", action="store_true", help="answer every received message with an [ack] text")
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, args.width, args.height, args.quality)
+    if not frames:
+        parser.error("no frames found for the given --images patterns")
+    server = DemoCannonServer(args.port, frames, args.fps, args.text_interval, args.state_interval,
+                              args.engage_interval, args.echo_commands)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import json
+
+# Sidecar event track of a recording, <video>.events.jsonl with one JSON object per line:
+# {"time": seconds from the first frame, "type": hit | miss | state | info, ...}. Times use the same
+# clock as the frame timestamps, so the player maps an event to a frame with the .ts sidecar.
+EVENT_TRACK_SUFFIX = ".events.jsonl"
+EVENT_TYPE_HIT = "hit"
+EVENT_TYPE_MISS = "miss"
+EVENT_TYPE_STATE = "state"
+# Session details at the start of a recording and whenever they change: target order, algorithm
+EVENT_TYPE_INFO = "info"
+
+class EventTrackWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path + EVENT_TRACK_SUFFIX, "a")
+
+    def write(self, seconds, event_type, fields):
+        entry = {"time": round(max(0.0, seconds), 6), "type": event_type}
+        entry.update(fields)
+        self.file.write(json.dumps(entry) + "\n")
+        # Few and precious, a crash mid-recording should not lose them
+        self.file.flush()
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def read_events(path):
+    events = []
+    if not os.path.exists(path + EVENT_TRACK_SUFFIX):
+        return events
+    with open(path + EVENT_TRACK_SUFFIX, "r") as file:
+        for line in file:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if "time" in event and "type" in event:
+                events.append(event)
+    events.sort(key=lambda event: event["time"])
+    return events
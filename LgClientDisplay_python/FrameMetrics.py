@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import bisect
+from collections import deque
+from datetime import datetime
+import numpy as np
+from constant.DisplayConstant import FRAME_METRICS_ENABLED, FRAME_METRICS_WINDOW, FRAME_METRICS_BUCKETS_MS
+
+FRAME_MARK_RECEIVE_START = "receive_start"
+FRAME_MARK_RECEIVE_END = "receive_end"
+FRAME_MARK_DECODE_END = "decode_end"
+FRAME_MARK_EMIT = "emit"
+# Set on the GUI thread when the signal delivers the frame and when the render scheduler picks it up
+FRAME_MARK_DELIVER = "deliver"
+FRAME_MARK_RENDER_START = "render_start"
+FRAME_MARK_PAINT = "paint"
+FRAME_MARK_RECORD_ENQUEUE = "record_enqueue"
+FRAME_MARK_RECORD_WRITTEN = "record_written"
+
+# (stage name, start mark, end mark), a sample is taken as soon as the end mark is set
+FRAME_STAGE_LIST = [
+    ("receive", FRAME_MARK_RECEIVE_START, FRAME_MARK_RECEIVE_END),
+    ("decode", FRAME_MARK_RECEIVE_END, FRAME_MARK_DECODE_END),
+    ("signal", FRAME_MARK_EMIT, FRAME_MARK_DELIVER),
+    ("render_wait", FRAME_MARK_DELIVER, FRAME_MARK_RENDER_START),
+    ("render", FRAME_MARK_RENDER_START, FRAME_MARK_PAINT),
+    ("frame_age", FRAME_MARK_RECEIVE_START, FRAME_MARK_PAINT),
+    ("record", FRAME_MARK_RECORD_ENQUEUE, FRAME_MARK_RECORD_WRITTEN),
+]
+FRAME_METRICS_PERCENTILE_LIST = [50, 95, 99]
+
+class FrameInfo:
+    # Travels with one frame from the socket to the screen and the recorder
+    __slots__ = ("metrics", "sequence", "marks")
+
+    def __init__(self, metrics, sequence):
+        self.metrics = metrics
+        self.sequence = sequence
+        self.marks = {}
+
+    def mark(self, name):
+        self.metrics.add_mark(self, name, time.perf_counter())
+
+class FrameMetrics:
+    # Rolling per-stage latency samples, frames only get a FrameInfo while enabled so the
+    # disabled cost on the frame path is one attribute check and a few None checks
+    def __init__(self, enabled=FRAME_METRICS_ENABLED, window=FRAME_METRICS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.next_sequence = 0
+        self.samples = {name: deque(maxlen=window) for name, _, _ in FRAME_STAGE_LIST}
+        self.stages_by_end = {}
+        for name, start, end in FRAME_STAGE_LIST:
+            self.stages_by_end.setdefault(end, []).append((name, start))
+        self.recent_frames = deque(maxlen=window)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def start_frame(self):
+        if not self.enabled:
+            return None
+        frame_info = FrameInfo(self, self.next_sequence)
+        self.next_sequence += 1
+        self.recent_frames.append(frame_info)
+        frame_info.mark(FRAME_MARK_RECEIVE_START)
+        return frame_info
+
+    def add_mark(self, frame_info, name, timestamp):
+        marks = frame_info.marks
+        marks[name] = timestamp
+        for stage, start in self.stages_by_end.get(name, ()):
+            start_time = marks.get(start)
+            if start_time is not None:
+                self.samples[stage].append((timestamp - start_time) * 1000.0)
+
+    def clear(self):
+        for samples in self.samples.values():
+            samples.clear()
+        self.recent_frames.clear()
+
+    def get_latest(self, stage):
+        samples = self.samples[stage]
+        return samples[-1] if samples else None
+
+    def get_histogram(self, stage):
+        # Counts per bucket of FRAME_METRICS_BUCKETS_MS, the last bucket holds everything above
+        counts = [0] * (len(FRAME_METRICS_BUCKETS_MS) + 1)
+        for value in list(self.samples[stage]):
+            counts[bisect.bisect_left(FRAME_METRICS_BUCKETS_MS, value)] += 1
+        return counts
+
+    def get_stage_summary(self, stage):
+        values = np.array(list(self.samples[stage]))
+        if values.size == 0:
+            return {"count": 0}
+        summary = {"count": int(values.size), "mean": round(float(values.mean()), 3)}
+        for percentile, value in zip(FRAME_METRICS_PERCENTILE_LIST, np.percentile(values, FRAME_METRICS_PERCENTILE_LIST)):
+            summary[f"p{percentile}"] = round(float(value), 3)
+        summary["max"] = round(float(values.max()), 3)
+        return summary
+
+    def get_summary(self):
+        return {name: self.get_stage_summary(name) for name, _, _ in FRAME_STAGE_LIST}
+
+    def get_recent_frames(self):
+        # Mark times relative to receive start in ms, a missing mark means the frame was dropped before it
+        frames = []
+        for frame_info in list(self.recent_frames):
+            marks = dict(frame_info.marks)
+            origin = marks.get(FRAME_MARK_RECEIVE_START)
+            if origin is None:
+                continue
+            frames.append({"sequence": frame_info.sequence,
+                           "marks": {name: round((value - origin) * 1000.0, 3) for name, value in marks.items()}})
+        return frames
+
+    def dump_to_file(self, directory):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, f"frame_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        report = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "buckets_ms": FRAME_METRICS_BUCKETS_MS,
+            "stages": {name: {"summary": self.get_stage_summary(name), "histogram": self.get_histogram(name)}
+                       for name, _, _ in FRAME_STAGE_LIST},
+            "frames": self.get_recent_frames(),
+        }
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+        return path
@@ -1,38 +1,60 @@
+import os
+import time
 import threading
 from PyQt5 import QtWidgets, QtCore
 import cv2
 from LgClientModel import LgClientModel
 from LgClientDisplay import LgClientDisplay
-import queue
+from PriorityEventQueue import PriorityEventQueue
 
 from TcpSendReceiver import TcpSendReceiver
+from AsyncTcpSendReceiver import AsyncTcpSendReceiver
 from VideoRecorder import VideoRecorder
+from SessionLogWriter import SessionLogWriter
+from FrameMetrics import FRAME_MARK_EMIT
+from EventTrack import EVENT_TYPE_HIT, EVENT_TYPE_MISS, EVENT_TYPE_STATE
 from constant.DisplayConstant import BUTTON_CV_AREA1_OBJECT_NAME, BUTTON_CV_AREA2_OBJECT_NAME, BUTTON_CV_AREA_MAX_OBJECT_NAME, BUTTON_CV_AREA_MIN_OBJECT_NAME,\
                                     BUTTON_CV_THRESHOLD_OBJECT_NAME, BUTTON_TF_DY_MV_OFF_OBJECT_NAME, BUTTON_TF_DY_MV_ON_OBJECT_NAME, BUTTON_TF_EPSILON_OBJECT_NAME, \
                                     BUTTON_TF_T1_OBJECT_NAME, BUTTON_TF_BOX_OBJECT_NAME, HIT_TEXT, KEY_DOWN_1, KEY_DOWN_2, KEY_FIRE_1, KEY_FIRE_2, KEY_LEFT_1, KEY_LEFT_2, \
                                     KEY_RIGHT_1, KEY_RIGHT_2, KEY_UP_1, KEY_UP_2, MISS_TEXT, SERVER_MESSAGE_TYPE_ALERT, SERVER_MESSAGE_TYPE_ERROR, SERVER_MESSAGE_TYPE_TITLE, \
-                                    SUB_STATE_ARMED, SUB_STATE_CALIB_OFF, SUB_STATE_CALIB_ON, SUB_STATE_FIRING, SUB_STATE_LASER_OFF, SUB_STATE_LASER_ON
-from constant.NetworkConfig import  REMOTE_PORT_NUM, NETWORK_CONNECTED, NETWORK_CONNECTING, NETWORK_DISCONNECTED
+                                    SUB_STATE_ARMED, SUB_STATE_CALIB_OFF, SUB_STATE_CALIB_ON, SUB_STATE_FIRING, SUB_STATE_LASER_OFF, SUB_STATE_LASER_ON, \
+                                    VIDEO_SURFACE_SOFTWARE_GL, PERFORMANCE_HUD_INTERVAL_MS, BUTTON_OPEN_CV_TITLE, BUTTON_TENSOR_FLOW_TITLE, \
+                                    AUTO_RECORD_ENABLED, AUTO_CLIP_FILE_PREFIX, AUTO_CLIP_TARGET_SUFFIX, AUTO_CLIP_MIN_SEC
+from constant.NetworkConfig import  REMOTE_PORT_NUM, NETWORK_CONNECTED, NETWORK_CONNECTING, NETWORK_DISCONNECTED, NETWORK_TRANSPORT_ASYNCIO
 from constant.SettingConstant import ARMED, CALIB_ON, CMD_USE_OPENCV, CMD_USE_TF, CONFIG_ID_CV_AREA1, CONFIG_ID_CV_AREA2, CONFIG_ID_CV_AREA_MAX, CONFIG_ID_CV_AREA_MIN, \
                                     CONFIG_ID_CV_THRESHOLD, CONFIG_ID_TF_DY_MV, CONFIG_ID_TF_EPSILON, CONFIG_ID_TF_T1, CONFIG_ID_TF_T2, FIRING, LASER_ON, PRE_ARM_CODE, \
                                     SYSTEM_MODE_ARMED_MANUAL, SYSTEM_MODE_AUTO_ENGAGE, SYSTEM_MODE_LIST, SYSTEM_MODE_PRE_ARM, SYSTEM_MODE_SAFE, \
                                     SYSTEM_MODE_TEXT_ARMED_MANUAL, SYSTEM_MODE_TEXT_AUTO_ENGAGE, SYSTEM_MODE_TEXT_PRE_ARM, SYSTEM_MODE_TEXT_SAFE, SYSTEM_MODE_TEXT_UNKNOWN, \
                                     SYSTEM_MODE_UNKNOWN, AUTO_ENGAGE_PAUSE, AUTO_ENGAGE_RESUME, AUTO_ENGAGE_STOP, DEC_X, DEC_Y, FIRE_START, FIRE_STOP, INC_X, INC_Y, \
                                     PAN_DOWN_START, PAN_DOWN_STOP, PAN_LEFT_START, PAN_LEFT_STOP, PAN_RIGHT_START, PAN_RIGHT_STOP, PAN_UP_START, PAN_UP_STOP, TITLE_OPEN_CV, \
-                                    TITLE_TENSOR_FLOW
+                                    TITLE_TENSOR_FLOW, EVENT_LANE_BOOKKEEPING, EVENT_LANE_CONFIG, EVENT_LANE_LIST, EVENT_LANE_MOTION, EVENT_LANE_SAFETY, \
+                                    EVENT_LANE_NAMES
                                         
 class LgClientController(QtCore.QThread):
 
     def __init__(self):
         super().__init__()
+        if VIDEO_SURFACE_SOFTWARE_GL:
+            os.environ["LIBGL_ALWAYS_SOFTWARE"] = "1"
+            QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_UseSoftwareOpenGL)
         self.app = QtWidgets.QApplication([])
         self.model = LgClientModel()
+        self.sessionLogWriter = SessionLogWriter()
+        self.sessionLogWriter.start()
+        self.model.set_log_writer(self.sessionLogWriter)
         self.ui = LgClientDisplay(self.model)
-        self.event_queue = queue.Queue()
+        self.event_queue = PriorityEventQueue(EVENT_LANE_LIST)
         self.videoRecorder = VideoRecorder(self.update_video_file_name)
         self.videoRecorder.start()
+        self.ui.video_player.open_recordings_callback = self.videoRecorder.get_open_file_names
         self.image_height = 0
         self.image_width = 0
+        self.video_size = None
+        # True while the recorder is writing auto-engage clips rather than a manual recording
+        self.auto_recording = False
+        self.performanceTimer = QtCore.QTimer()
+        self.performanceTimer.timeout.connect(self.update_performance_stats)
+        self.performance_snapshot = None
 
         self.ui.pushButton_connection.clicked.connect(self.enqueue_connect_to_server)
         # State button
@@ -74,7 +96,9 @@ class LgClientController(QtCore.QThread):
         self.ui.config_dialog.button_dy_mv_on.clicked.connect(self.enqueue_set_config)
         self.ui.config_dialog.button_dy_mv_off.clicked.connect(self.enqueue_set_config)
         self.model.record_video_signal.connect(self.set_video_record)
+        self.model.video_size_signal.connect(self.update_video_size)
         self.model.hit_number_siganl.connect(self.ui.hit_number)
+        self.ui.actionPerformanceHud.toggled.connect(self.toggle_performance_hud)
         for key, button in self.ui.keys:
             button.clicked.connect(lambda checked, obj_name=button.objectName(): self.enqueue_set_click_event(obj_name))
 
@@ -83,8 +107,14 @@ class LgClientController(QtCore.QThread):
         self.start()
 
         self.app.exec_()
-        self.event_queue.put(None)
+        self.event_queue.put(EVENT_LANE_BOOKKEEPING, None)
         self.wait()
+        if self.videoRecorder.get_recording():
+            self.videoRecorder.enqueue_stop_record_video()
+        self.videoRecorder.enqueue_exit()
+        self.videoRecorder.wait()
+        self.sessionLogWriter.enqueue_stop()
+        self.sessionLogWriter.wait()
 
     def set_ui_update_signal(self):
         self.model.log_messages_signal.connect(self.ui.update_log)
@@ -96,6 +126,7 @@ class LgClientController(QtCore.QThread):
         self.model.algorithm_select_signal.connect(self.ui.update_algorithm)
         self.model.robot_action_signal.connect(self.ui.update_robot_action)
         self.model.display_alert_signal.connect(self.ui.display_alert)
+        self.model.performance_stats_signal.connect(self.ui.update_performance_hud)
 
     def run(self):
         while True:
@@ -104,7 +135,6 @@ class LgClientController(QtCore.QThread):
                 break
             func, args = event
             func(*args)
-            self.event_queue.task_done()
     
     # Video Record
     def set_video_record(self, record):
@@ -112,9 +142,69 @@ class LgClientController(QtCore.QThread):
         if recorderState == record:
             return
         
-        self.videoRecorder.set_recording(record, (self.image_width, self.image_height))
+        # Stopping by hand also ends auto-engage clips
+        self.auto_recording = False
+        self.videoRecorder.set_recording(record, self.get_record_frame_size())
+        self.apply_jpeg_recording()
+        self.apply_decode_size()
         if not record:
             self.videoRecorder.enqueue_stop_record_video()
+
+    def get_record_frame_size(self):
+        # Record at the source resolution rather than the display size
+        frameSize = (self.image_width, self.image_height)
+        if hasattr(self, 'tcpSendReceive'):
+            sourceSize = self.tcpSendReceive.get_source_frame_size()
+            if sourceSize is not None:
+                frameSize = sourceSize
+        return frameSize
+
+    def update_auto_record(self, state):
+        # Starts clips on entering auto-engage unless a manual recording is running, stops them on Safe or Pre-Arm
+        # and on a disconnect, which reports the unknown mode
+        if not AUTO_RECORD_ENABLED:
+            return
+        mode = self.extract_system_mode(state)
+        if mode == SYSTEM_MODE_AUTO_ENGAGE and not self.auto_recording and not self.videoRecorder.get_recording():
+            self.auto_recording = True
+            self.model.add_log_message_normal("Recording engagement clips")
+            self.videoRecorder.set_recording(True, self.get_record_frame_size(), AUTO_CLIP_FILE_PREFIX)
+            self.apply_jpeg_recording()
+            self.apply_decode_size()
+        elif self.auto_recording and mode in (SYSTEM_MODE_SAFE, SYSTEM_MODE_PRE_ARM, SYSTEM_MODE_UNKNOWN):
+            self.auto_recording = False
+            self.videoRecorder.set_recording(False, None)
+            self.apply_jpeg_recording()
+            self.apply_decode_size()
+            self.videoRecorder.enqueue_stop_record_video(AUTO_CLIP_MIN_SEC)
+
+    def update_session_info(self):
+        # Target order and algorithm go into the event track so the recording catalog can list them
+        algorithmDict = {CMD_USE_OPENCV: BUTTON_OPEN_CV_TITLE, CMD_USE_TF: BUTTON_TENSOR_FLOW_TITLE}
+        self.videoRecorder.set_session_info({"target_order": self.model.get_target_order(),
+                                             "algorithm": algorithmDict.get(self.model.get_algo(), "")})
+
+    def update_video_size(self, width, height):
+        self.video_size = (width, height)
+        self.apply_decode_size()
+
+    def apply_jpeg_recording(self):
+        # Pass-through recording takes the JPEG bytes straight from the receiver,
+        # and the pre-event buffer keeps the last seconds of them while idle
+        if not hasattr(self, 'tcpSendReceive'):
+            return
+        if self.videoRecorder.needs_jpeg_frames():
+            self.tcpSendReceive.set_jpeg_callback(self.videoRecorder.receive_jpeg)
+        else:
+            self.tcpSendReceive.set_jpeg_callback(None)
+
+    def apply_decode_size(self):
+        if not hasattr(self, 'tcpSendReceive'):
+            return
+        if self.videoRecorder.get_recording() and not self.videoRecorder.is_passthrough():
+            self.tcpSendReceive.set_decode_size(None)
+        else:
+            self.tcpSendReceive.set_decode_size(self.video_size)
     
     # Queue Function
     def enqueue_connect_to_server(self):
@@ -124,40 +214,44 @@ class LgClientController(QtCore.QThread):
                 self.tcpSendReceive.disconnect()
             self.update_connection(NETWORK_DISCONNECTED)
         else:
-            self.event_queue.put((self.connect_to_server, [connectionState]))
+            self.event_queue.put(EVENT_LANE_BOOKKEEPING, (self.connect_to_server, [connectionState]))
 
     def enqueue_set_safe_code(self):
-        self.event_queue.put((self.set_safe_mode, []))
+        self.event_queue.put(EVENT_LANE_SAFETY, (self.set_safe_mode, []))
 
     def enqueue_set_pre_arm_code(self):
-        self.event_queue.put((self.set_pre_arm_code, []))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_pre_arm_code, []))
 
     def enqueue_set_armed_manual(self):
-        self.event_queue.put((self.set_armed_manual, []))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_armed_manual, []))
         
     def enqueue_set_key_event(self, key, pressed):
-        self.event_queue.put((self.set_key_event, [key, pressed]))
+        # A release jumps ahead as a STOP, unless its press is still waiting in the motion lane
+        if pressed or self.event_queue.has_pending(EVENT_LANE_MOTION, lambda event: event == (self.set_key_event, [key, True])):
+            self.event_queue.put(EVENT_LANE_MOTION, (self.set_key_event, [key, pressed]))
+        else:
+            self.event_queue.put(EVENT_LANE_SAFETY, (self.set_key_event, [key, pressed]))
         
     def enqueue_set_laser(self, state):
-        self.event_queue.put((self.set_laser_state, [state]))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_laser_state, [state]))
     
     def enqueue_set_calibrate(self, state):
-        self.event_queue.put((self.set_calibrate_state, [state]))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_calibrate_state, [state]))
         
     def enqueue_set_auto_engage_start(self):
-        self.event_queue.put((self.set_auto_engage_start, []))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_auto_engage_start, []))
         
     def enqueue_set_auto_engage_stop(self):
-        self.event_queue.put((self.set_auto_engage_stop, []))
+        self.event_queue.put(EVENT_LANE_SAFETY, (self.set_auto_engage_stop, []))
         
     def enqueue_set_click_event(self, object_name):
-        self.event_queue.put((self.set_click_event, [object_name]))
+        self.event_queue.put(EVENT_LANE_MOTION, (self.set_click_event, [object_name]))
     
     def enqueue_set_open_cv(self):
-        self.event_queue.put((self.set_algorithm, [CMD_USE_OPENCV]))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_algorithm, [CMD_USE_OPENCV]))
 
     def enqueue_set_tf(self):
-        self.event_queue.put((self.set_algorithm, [CMD_USE_TF]))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_algorithm, [CMD_USE_TF]))
     
     def enqueue_set_config(self):
         sender = self.sender()
@@ -196,7 +290,7 @@ class LgClientController(QtCore.QThread):
         if value == "":
             return
         
-        self.event_queue.put((self.set_config_value, [type, value]))
+        self.event_queue.put(EVENT_LANE_CONFIG, (self.set_config_value, [type, value]))
 
     def connect_to_server(self, connectionState):
         if connectionState == NETWORK_DISCONNECTED:
@@ -204,13 +298,17 @@ class LgClientController(QtCore.QThread):
             remote_address = self.ui.editText_remote_address.text()
             self.model.set_remote_address(remote_address)
             self.model.add_log_message_normal(f"Connecting to {remote_address}...")
-            self.tcpSendReceive = TcpSendReceiver(remote_address, 
-                                                  REMOTE_PORT_NUM,
-                                                  self.update_connection,
-                                                  self.update_image,
-                                                  self.update_text,
-                                                  self.update_state,
-                                                  self.update_algo)
+            transportClass = AsyncTcpSendReceiver if NETWORK_TRANSPORT_ASYNCIO else TcpSendReceiver
+            self.tcpSendReceive = transportClass(remote_address, 
+                                                 REMOTE_PORT_NUM,
+                                                 self.update_connection,
+                                                 self.update_image,
+                                                 self.update_text,
+                                                 self.update_state,
+                                                 self.update_algo)
+            self.tcpSendReceive.set_frame_metrics(self.model.frame_metrics)
+            self.apply_jpeg_recording()
+            self.apply_decode_size()
             self.tcpSendReceive.connect()
             #TEST
             # self.model.set_connection_state(NETWORK_CONNECTED)
@@ -284,6 +382,7 @@ class LgClientController(QtCore.QThread):
             self.model.add_log_message_error("Empty Target")
             return
         self.model.set_target_order(targetOrder)
+        self.update_session_info()
         self.model.add_log_message_emphasis("Target order : " + targetOrder)
         self.tcpSendReceive.send_target_order_to_server(targetOrder)
         
@@ -302,6 +401,48 @@ class LgClientController(QtCore.QThread):
         self.model.add_log_message_normal(f"Set {type}: {value}")
         self.tcpSendReceive.send_config_to_server(type, value)
     
+    def get_event_lane_stats(self):
+        # Lane name -> queue depth and last/average/max wait in ms
+        return {EVENT_LANE_NAMES[lane]: {"depth": depth, "wait_ms": last * 1000.0, "average_ms": average * 1000.0, "max_ms": maximum * 1000.0}
+                for lane, (depth, last, average, maximum) in self.event_queue.get_lane_stats().items()}
+
+    # Performance HUD
+    def toggle_performance_hud(self, enabled):
+        self.performance_snapshot = None
+        if enabled:
+            self.performanceTimer.start(PERFORMANCE_HUD_INTERVAL_MS)
+        else:
+            self.performanceTimer.stop()
+
+    def update_performance_stats(self):
+        # Rates are deltas between two ticks, counters restart with every new connection
+        receiver = getattr(self, 'tcpSendReceive', None)
+        connected = receiver is not None and receiver.is_connected()
+        received, decoded, decode_dropped = receiver.get_frame_stats() if connected else (0, 0, 0)
+        received_bytes, decode_seconds = receiver.get_throughput_stats() if connected else (0, 0.0)
+        submitted, rendered, render_dropped = self.ui.renderScheduler.get_stats()
+        snapshot = (receiver, time.monotonic(), received, decoded, decode_seconds, received_bytes, rendered)
+        previous = self.performance_snapshot
+        self.performance_snapshot = snapshot
+        if previous is None or previous[0] is not receiver:
+            return
+        elapsed = max(snapshot[1] - previous[1], 1e-6)
+        decoded_delta = decoded - previous[3]
+        self.model.set_performance_stats({
+            "receive_fps": (received - previous[2]) / elapsed,
+            "render_fps": (rendered - previous[6]) / elapsed,
+            "decode_ms": (decode_seconds - previous[4]) * 1000.0 / decoded_delta if decoded_delta > 0 else None,
+            "frame_age_ms": self.model.frame_metrics.get_latest("frame_age"),
+            "mbps": (received_bytes - previous[5]) * 8 / elapsed / 1e6,
+            "decode_dropped": decode_dropped,
+            "render_dropped": render_dropped,
+            "send_dropped": receiver.get_send_dropped(),
+            "recorder_queue": self.videoRecorder.get_queue_depth(),
+            "recorder_dropped": self.videoRecorder.get_record_stats()[2],
+            "controller_queue": self.event_queue.qsize(),
+            "event_lanes": self.get_event_lane_stats(),
+        })
+
     # Callback functions
     def update_connection(self, status):
         if self.model.get_connection_state == status:
@@ -322,10 +463,13 @@ class LgClientController(QtCore.QThread):
         if state != SYSTEM_MODE_UNKNOWN:
             stateText = self.stateDict[self.extract_system_mode(state)]
             self.model.add_log_message_server(f"[Mode] {stateText}")
+            if self.videoRecorder.get_recording():
+                self.videoRecorder.enqueue_record_event(EVENT_TYPE_STATE, {"state": state, "text": stateText})
         if state&SYSTEM_MODE_SAFE or state&SYSTEM_MODE_UNKNOWN:
             self.model.set_pre_arm_code("")
         self.model.set_system_state(state)
         self.handle_sub_state(currentState, state)
+        self.update_auto_record(state)
     
     def update_text(self, text):
         if text.find(SERVER_MESSAGE_TYPE_TITLE) != -1:
@@ -352,17 +496,29 @@ class LgClientController(QtCore.QThread):
             last_char = textJoin[-1]
             hit_number = int(last_char)
             self.model.set_hit_number(hit_number)
+            eventType = EVENT_TYPE_HIT if text.find(HIT_TEXT) != -1 else EVENT_TYPE_MISS
+            eventFields = {"target": hit_number, "text": text.strip("\0\n ")}
+            if self.videoRecorder.get_recording():
+                self.videoRecorder.enqueue_record_event(eventType, eventFields)
+                if self.auto_recording:
+                    # The clip that ends with this report is named after its target
+                    self.videoRecorder.enqueue_cut_clip(f"{AUTO_CLIP_TARGET_SUFFIX}{hit_number}")
+            else:
+                self.videoRecorder.enqueue_save_replay(eventType, eventFields)
         
-    def update_image(self, image):
+    def update_image(self, image, frame_info=None):
         height, width, channels = image.shape
         self.image_width = width
         self.image_height = height
-        self.model.process_image_signal.emit(image)
-        if self.videoRecorder.get_recording():
-            self.videoRecorder.enqueue_record_video(image)
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_EMIT)
+        self.model.process_image_signal.emit(image, frame_info)
+        if self.videoRecorder.get_recording() and not self.videoRecorder.is_passthrough():
+            self.videoRecorder.enqueue_record_video(image, frame_info)
     
     def update_algo(self, algo):
         self.model.set_algo(algo)
+        self.update_session_info()
         
     def update_video_file_name(self, fileName):
         self.model.add_log_message_normal(f"Video saved : {fileName}")
@@ -7,6 +7,9 @@ from display.ColorLabel import ColorLabel
 from display.ConfigDialog import ConfigDialog
 from LgClientModel import LgClientModel
 from display.NumericPlainTextEdit import NumericPlainTextEdit
+from display.RenderScheduler import RenderScheduler
+from display.GlVideoWidget import GlVideoWidget
+from FrameMetrics import FRAME_MARK_DELIVER, FRAME_MARK_PAINT, FRAME_MARK_RENDER_START, FRAME_STAGE_LIST
 import constant.DisplayConstant as Display
 import constant.SettingConstant as Setting
 import constant.NetworkConfig as Network
@@ -48,10 +51,14 @@ class LgClientDisplay(QtWidgets.QMainWindow):
             (Display.KEY_FIRE_2, self.button_fire)
         ]
         
-        for key, button in self.keys:
-            self.bind_key_to_button(key, button)
-            keyboard.on_press_key(key, lambda _, k=key: self.handle_key_event(k, True))
-            keyboard.on_release_key(key, lambda _, k=key: self.handle_key_event(k, False))
+        try:
+            for key, button in self.keys:
+                self.bind_key_to_button(key, button)
+                keyboard.on_press_key(key, lambda _, k=key: self.handle_key_event(k, True))
+                keyboard.on_release_key(key, lambda _, k=key: self.handle_key_event(k, False))
+        except (ImportError, AssertionError, OSError) as e:
+            # Global hooks need root and an input device on Linux, the buttons still work with the mouse
+            print(f"Keyboard hooks unavailable: {e}")
             
     def bind_key_to_button(self, key, button):
         press_handler = keyboard.on_press_key(key, lambda _: button.setDown(True))
@@ -171,9 +178,14 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         self.menuHelp.setStyleSheet(self.getMenuStyle())
         self.menuHelp.setObjectName(Display.MENUHELP_OBJECT_NAME)
 
+        self.menuView = QtWidgets.QMenu(self.menubar)
+        self.menuView.setStyleSheet(self.getMenuStyle())
+        self.menuView.setObjectName(Display.MENUVIEW_OBJECT_NAME)
+
         LgClientDisplay.setMenuBar(self.menubar)
         self.setupMenuActions()
         self.menubar.addAction(self.menuFile.menuAction())
+        self.menubar.addAction(self.menuView.menuAction())
         self.menubar.addAction(self.menuHelp.menuAction())
 
     def setupMenuActions(self):
@@ -193,7 +205,27 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         self.actionConfig.triggered.connect(self.pop_up_action_config)
         self.actionConfig.setEnabled(False)
 
+        self.actionFrameStats = QtWidgets.QAction(Display.ACTION_FRAME_STATS, self.menubar)
+        self.actionFrameStats.setFont(self.getRegularFont())
+        self.actionFrameStats.setMenuRole(QtWidgets.QAction.NoRole)
+        self.actionFrameStats.setCheckable(True)
+        self.actionFrameStats.toggled.connect(self.toggle_frame_stats)
+
+        self.actionPerformanceHud = QtWidgets.QAction(Display.ACTION_PERFORMANCE_HUD, self.menubar)
+        self.actionPerformanceHud.setFont(self.getRegularFont())
+        self.actionPerformanceHud.setMenuRole(QtWidgets.QAction.NoRole)
+        self.actionPerformanceHud.setCheckable(True)
+        self.actionPerformanceHud.toggled.connect(self.toggle_performance_hud)
+
+        self.actionDumpFrameStats = QtWidgets.QAction(Display.ACTION_DUMP_FRAME_STATS, self.menubar)
+        self.actionDumpFrameStats.setFont(self.getRegularFont())
+        self.actionDumpFrameStats.setMenuRole(QtWidgets.QAction.NoRole)
+        self.actionDumpFrameStats.triggered.connect(self.dump_frame_stats)
+
         self.menuFile.addAction(self.actionExit)
+        self.menuView.addAction(self.actionPerformanceHud)
+        self.menuView.addAction(self.actionFrameStats)
+        self.menuView.addAction(self.actionDumpFrameStats)
         self.menuHelp.addAction(self.actionAbout)
         self.menuHelp.addAction(self.actionConfig)
 
@@ -561,6 +593,8 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         self.nonEditText_log.setLineWidth(1)
         self.nonEditText_log.setReadOnly(True)
         self.nonEditText_log.setObjectName(Display.NONEDIT_TEXT_LOG_OBJECT_NAME)
+        # One block per message, the document drops the oldest blocks past the cap
+        self.nonEditText_log.document().setMaximumBlockCount(Display.LOG_MAX_MESSAGES)
 
     def setupAlgoSelectionPanel(self):
         self.groupBox_algo = QtWidgets.QGroupBox()
@@ -695,10 +729,14 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         self.verticalLayout.setContentsMargins(10, 10, 10, 10)
         self.verticalLayout.setObjectName(Display.CAMERA_VERTICAL_LAYOUTE_OBJECT_NAME)
         
-        self.label_camera_video = QtWidgets.QLabel(self.verticalLayoutWidget)
+        self.useGlVideo = Display.VIDEO_SURFACE_OPENGL and GlVideoWidget.is_available()
+        if self.useGlVideo:
+            self.label_camera_video = GlVideoWidget(self.verticalLayoutWidget)
+            # Queued, the GL widget must not be replaced from inside its own initializeGL
+            self.label_camera_video.initializationFailed.connect(self.fall_back_to_label_video, QtCore.Qt.QueuedConnection)
+        else:
+            self.label_camera_video = self.create_label_video()
         self.label_camera_video.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
-        self.label_camera_video.setStyleSheet(Style.LABEL_CAMERA_STYLE)
-        self.label_camera_video.setAlignment(QtCore.Qt.AlignCenter)
         self.label_camera_video.setObjectName(Display.LABEL_CAMERA_VIDEO_OBJECT_NAME)
         
         self.overlayWidget = QtWidgets.QWidget(self.label_camera_video)
@@ -713,14 +751,63 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         self.iconLabel.setScaledContents(True)
         self.iconLabel.setGeometry(0, 0, 50, 50)
         self.iconLabel.hide()
+
+        self.frameStatsOverlay = QtWidgets.QLabel(self.label_camera_video)
+        self.frameStatsOverlay.setStyleSheet(Style.FRAME_STATS_OVERLAY_STYLE)
+        self.frameStatsOverlay.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.frameStatsOverlay.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.frameStatsOverlay.move(Display.FRAME_STATS_OVERLAY_MARGIN, Display.FRAME_STATS_OVERLAY_MARGIN)
+        self.frameStatsOverlay.hide()
+
+        self.hudWidget = QtWidgets.QWidget(self.label_camera_video)
+        self.hudWidget.setStyleSheet(Style.OVERLAY_STYLE)
+        self.hudWidget.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.hudLabel = QtWidgets.QLabel(self.hudWidget)
+        self.hudLabel.setStyleSheet(Style.PERFORMANCE_HUD_STYLE)
+        self.hudLabel.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.hudWidget.hide()
+        self.frameStatsTimer = QtCore.QTimer(self)
+        self.frameStatsTimer.timeout.connect(self.update_frame_stats_overlay)
         
         self.verticalLayout.addWidget(self.label_camera_video)
         self.groupBox_camera_video.setLayout(self.verticalLayout)
 
         self.label_camera_video.resizeEvent = self.onLabelCameraVideoResize
+        self.renderScheduler = RenderScheduler(self.render_image, Display.RENDER_MAX_FPS, self)
+
+    def create_label_video(self):
+        label = QtWidgets.QLabel(self.verticalLayoutWidget)
+        label.setStyleSheet(Style.LABEL_CAMERA_STYLE)
+        label.setAlignment(QtCore.Qt.AlignCenter)
+        return label
+
+    def fall_back_to_label_video(self):
+        # The GL surface failed at runtime, the overlays move to a QLabel that takes its place in the layout
+        if not self.useGlVideo:
+            return
+        self.useGlVideo = False
+        glWidget = self.label_camera_video
+        label = self.create_label_video()
+        label.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        label.setObjectName(Display.LABEL_CAMERA_VIDEO_OBJECT_NAME)
+        for overlay in (self.overlayWidget, self.frameStatsOverlay, self.hudWidget):
+            # setParent hides the widget, its visibility is restored afterwards
+            visible = not overlay.isHidden()
+            overlay.setParent(label)
+            overlay.setVisible(visible)
+        self.verticalLayout.replaceWidget(glWidget, label)
+        self.label_camera_video = label
+        label.resizeEvent = self.onLabelCameraVideoResize
+        glWidget.hide()
+        glWidget.deleteLater()
+        self.model.add_log_message_normal("OpenGL video surface unavailable, using the QLabel surface")
 
     def onLabelCameraVideoResize(self, event):
+        # The GL surface needs its own resizeEvent to resize the framebuffer
+        type(self.label_camera_video).resizeEvent(self.label_camera_video, event)
         self.overlayWidget.move(self.label_camera_video.width() - self.overlayWidget.width(), 0)
+        self.move_performance_hud()
+        self.model.set_video_size(self.label_camera_video.width(), self.label_camera_video.height())
         event.accept()
 
     def retranslateUi(self, LgClientDisplay):
@@ -760,9 +847,13 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         self.groupBox_target_order.setTitle(_translate(Display.WINDOW_TITLE, Display.GROUPBOX_TARGET_ORDER_TITLE))
         self.menuFile.setTitle(_translate(Display.WINDOW_TITLE, Display.MENUFILE_TEXT))
         self.menuHelp.setTitle(_translate(Display.WINDOW_TITLE, Display.MENUHELP_TEXT))
+        self.menuView.setTitle(_translate(Display.WINDOW_TITLE, Display.MENUVIEW_TEXT))
         self.actionExit.setText(_translate(Display.WINDOW_TITLE, Display.MENUEXIT_TEXT))
         self.actionAbout.setText(_translate(Display.WINDOW_TITLE, Display.MENUABOUT_TEXT))
         self.actionConfig.setText(_translate(Display.WINDOW_TITLE, Display.MENUACONFIG_TEXT))
+        self.actionPerformanceHud.setText(_translate(Display.WINDOW_TITLE, Display.MENUPERFORMANCE_HUD_TEXT))
+        self.actionFrameStats.setText(_translate(Display.WINDOW_TITLE, Display.MENUFRAME_STATS_TEXT))
+        self.actionDumpFrameStats.setText(_translate(Display.WINDOW_TITLE, Display.MENUDUMP_FRAME_STATS_TEXT))
 
     def getRegularFont(self, pointSize=11):
         font = QtGui.QFont()
@@ -844,8 +935,13 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         shadow.setYOffset(3)
         button.setGraphicsEffect(shadow)
 
-    def update_log(self, log_messages):
-        self.nonEditText_log.setHtml("\n".join(log_messages))
+    def update_log(self, message):
+        document = self.nonEditText_log.document()
+        cursor = QtGui.QTextCursor(document)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        if not document.isEmpty():
+            cursor.insertBlock()
+        cursor.insertHtml(message)
         self.scroll_log_to_last_line()
         
     def scroll_log_to_last_line(self):
@@ -913,6 +1009,7 @@ class LgClientDisplay(QtWidgets.QMainWindow):
         self.pushButton_safe_mode.setStyleSheet(self.getDisabledButtonStyle())
         self.pushButton_armed_manual.setStyleSheet(self.getDisabledButtonStyle())
         self.pushButton_auto_engage.setStyleSheet(self.getDisabledButtonStyle())
+        self.renderScheduler.clear()
         self.label_camera_video.clear()
         self.groupBox_algo.setEnabled(False)
         self.groupBox_algo.setStyleSheet(self.getDisabledPanelStyle())
@@ -1026,11 +1123,103 @@ class LgClientDisplay(QtWidgets.QMainWindow):
                 return
             self.model.key_pressed_signal.emit(key, pressed)
         
-    def display_image(self, image):
-        qimage = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimage)
-        scaled_pixmap = pixmap.scaled(self.label_camera_video.size(), QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
-        self.label_camera_video.setPixmap(scaled_pixmap)
+    def display_image(self, image, frame_info=None):
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_DELIVER)
+        self.renderScheduler.submit(image, frame_info)
+
+    def render_image(self, image, frame_info=None):
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_RENDER_START)
+        if self.useGlVideo:
+            self.label_camera_video.set_frame(image)
+        else:
+            qimage = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], QImage.Format_BGR888)
+            pixmap = QPixmap.fromImage(qimage)
+            if pixmap.size() != self.label_camera_video.size():
+                pixmap = pixmap.scaled(self.label_camera_video.size(), QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+            self.label_camera_video.setPixmap(pixmap)
+        # On the GL surface this is the hand-off to the widget, the buffer swap follows on the next paint
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_PAINT)
+
+    def update_frame_metrics_enabled(self):
+        # The stats overlay and the HUD frame age both read FrameMetrics
+        enabled = self.actionFrameStats.isChecked() or self.actionPerformanceHud.isChecked()
+        if enabled and not self.model.frame_metrics.enabled:
+            self.model.frame_metrics.clear()
+        self.model.frame_metrics.set_enabled(enabled)
+
+    def toggle_performance_hud(self, enabled):
+        self.update_frame_metrics_enabled()
+        if enabled:
+            self.hudLabel.setText(Display.PERFORMANCE_HUD_WAITING_TEXT)
+            self.resize_performance_hud()
+            self.hudWidget.show()
+        else:
+            self.hudWidget.hide()
+
+    def update_performance_hud(self, stats):
+        if not self.hudWidget.isVisible():
+            return
+        decode_ms = "-" if stats["decode_ms"] is None else f"{stats['decode_ms']:.1f}"
+        frame_age_ms = "-" if stats["frame_age_ms"] is None else f"{stats['frame_age_ms']:.1f}"
+        self.hudLabel.setText(
+            f"rx {stats['receive_fps']:5.1f} fps  render {stats['render_fps']:5.1f} fps\n"
+            f"decode {decode_ms:>5} ms  age {frame_age_ms:>6} ms\n"
+            f"net {stats['mbps']:6.2f} Mbps  dropped {stats['decode_dropped']}/{stats['render_dropped']}  send drop {stats['send_dropped']}\n"
+            f"rec queue {stats['recorder_queue']:<3} drop {stats['recorder_dropped']:<4} ctrl queue {stats['controller_queue']}"
+            + "".join(f"\n{name:<11} q {lane['depth']:<3} wait {lane['wait_ms']:6.1f} avg {lane['average_ms']:6.1f} max {lane['max_ms']:7.1f} ms"
+                      for name, lane in stats["event_lanes"].items()))
+        self.resize_performance_hud()
+
+    def resize_performance_hud(self):
+        self.hudLabel.adjustSize()
+        self.hudWidget.resize(self.hudLabel.size())
+        self.move_performance_hud()
+
+    def move_performance_hud(self):
+        self.hudWidget.move(Display.PERFORMANCE_HUD_MARGIN,
+                            self.label_camera_video.height() - self.hudWidget.height() - Display.PERFORMANCE_HUD_MARGIN)
+
+    def toggle_frame_stats(self, enabled):
+        self.update_frame_metrics_enabled()
+        if enabled:
+            self.update_frame_stats_overlay()
+            self.frameStatsOverlay.show()
+            self.frameStatsTimer.start(Display.FRAME_STATS_OVERLAY_INTERVAL_MS)
+        else:
+            self.frameStatsTimer.stop()
+            self.frameStatsOverlay.hide()
+
+    def update_frame_stats_overlay(self):
+        # One row per stage with percentiles and a sparkline of the rolling histogram
+        lines = [f"{'stage':<12}{'n':>5}{'p50':>8}{'p95':>8}{'max':>8}  histogram (ms)"]
+        for stage, _, _ in FRAME_STAGE_LIST:
+            summary = self.model.frame_metrics.get_stage_summary(stage)
+            if summary["count"] == 0:
+                lines.append(f"{stage:<12}{0:>5}")
+                continue
+            sparkline = self.get_sparkline(self.model.frame_metrics.get_histogram(stage))
+            lines.append(f"{stage:<12}{summary['count']:>5}{summary['p50']:>8.1f}{summary['p95']:>8.1f}{summary['max']:>8.1f}  {sparkline}")
+        edges = " ".join(str(edge) for edge in Display.FRAME_METRICS_BUCKETS_MS)
+        lines.append(f"buckets <= {edges} > {Display.FRAME_METRICS_BUCKETS_MS[-1]}")
+        self.frameStatsOverlay.setText("\n".join(lines))
+        self.frameStatsOverlay.adjustSize()
+
+    def get_sparkline(self, counts):
+        # Rounded up so a bucket with any samples never shows as blank
+        levels = len(Display.FRAME_STATS_SPARKLINE) - 1
+        peak = max(counts)
+        return "".join(Display.FRAME_STATS_SPARKLINE[-(-levels * count // peak)] for count in counts)
+
+    def dump_frame_stats(self):
+        try:
+            path = self.model.frame_metrics.dump_to_file(os.path.join(os.getcwd(), Display.SESSION_LOG_FILE_LOCATION))
+        except OSError as e:
+            self.model.add_log_message_error(f"Frame stats dump failed : {e}")
+            return
+        self.model.add_log_message_normal(f"Frame stats saved : {path}")
         
     def auto_engage_toggle(self):
         if self.pushButton_auto_start.isChecked():
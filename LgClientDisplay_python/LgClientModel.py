@@ -1,20 +1,26 @@
+from collections import deque
 from PyQt5 import QtCore
 import numpy as np
+from constant.DisplayConstant import LOG_MAX_MESSAGES, LOG_LEVEL_EMPHASIS, LOG_LEVEL_ERROR, LOG_LEVEL_NORMAL, LOG_LEVEL_SERVER, \
+                                    LOG_LEVEL_SERVER_ERROR, LOG_SOURCE_CLIENT, LOG_SOURCE_SERVER
 from constant.NetworkConfig import NETWORK_DISCONNECTED
 from constant.SettingConstant import SYSTEM_MODE_UNKNOWN
+from FrameMetrics import FrameMetrics
 
 class LgClientModel(QtCore.QObject):
-    log_messages_signal = QtCore.pyqtSignal(list)
+    log_messages_signal = QtCore.pyqtSignal(str)
     connection_state_signal = QtCore.pyqtSignal(int)
     system_state_signal = QtCore.pyqtSignal(int)
     laser_state_signal = QtCore.pyqtSignal(bool)
     calibrate_state_signal = QtCore.pyqtSignal(bool)
-    process_image_signal = QtCore.pyqtSignal(np.ndarray)
+    process_image_signal = QtCore.pyqtSignal(np.ndarray, object)
     algorithm_select_signal = QtCore.pyqtSignal(int)
     robot_action_signal = QtCore.pyqtSignal(str)
     display_alert_signal = QtCore.pyqtSignal(str)
     record_video_signal = QtCore.pyqtSignal(bool)
     hit_number_siganl = QtCore.pyqtSignal(int)
+    video_size_signal = QtCore.pyqtSignal(int, int)
+    performance_stats_signal = QtCore.pyqtSignal(object)
 
     key_pressed_signal = QtCore.pyqtSignal(str, bool)
 
@@ -23,8 +29,11 @@ class LgClientModel(QtCore.QObject):
         self.remote_address = "raspberrypi.local"
         self.pre_arm_code = ""
         self.target_order = ""
+        self.algorithm = None
         self.system_state = SYSTEM_MODE_UNKNOWN
-        self.log_messages = []
+        self.log_messages = deque(maxlen=LOG_MAX_MESSAGES)
+        self.log_writer = None
+        self.frame_metrics = FrameMetrics()
         self.connectionState = NETWORK_DISCONNECTED
 
     def set_remote_address(self, address):
@@ -42,32 +51,40 @@ class LgClientModel(QtCore.QObject):
     def add_log_message_normal(self, message):
         if message == "":
             return
-        self.log_messages.append(f'<span style="color:black">{message}</span><br>')
-        self.log_messages_signal.emit(self.log_messages)
+        self.append_log_message(LOG_LEVEL_NORMAL, LOG_SOURCE_CLIENT, message, f'<span style="color:black">{message}</span>')
     
     def add_log_message_emphasis(self, message):
         if message == "":
             return
-        self.log_messages.append(f'<span style="color:green">{message}</span><br>')
-        self.log_messages_signal.emit(self.log_messages)
+        self.append_log_message(LOG_LEVEL_EMPHASIS, LOG_SOURCE_CLIENT, message, f'<span style="color:green">{message}</span>')
 
     def add_log_message_error(self, message):
         if message == "":
             return
-        self.log_messages.append(f'<span style="color:red">{message}</span><br>')
-        self.log_messages_signal.emit(self.log_messages)
+        self.append_log_message(LOG_LEVEL_ERROR, LOG_SOURCE_CLIENT, message, f'<span style="color:red">{message}</span>')
 
     def add_log_message_server(self, message):
         if message == "":
             return
-        self.log_messages.append(f'<span style="color:blue">[Server]{message}</span><br>')
-        self.log_messages_signal.emit(self.log_messages)
+        self.append_log_message(LOG_LEVEL_SERVER, LOG_SOURCE_SERVER, message, f'<span style="color:blue">[Server]{message}</span>')
         
     def add_log_message_server_error(self, message):
         if message == "":
             return
-        self.log_messages.append(f'<span style="color:red">[Server]{message}</span><br>')
-        self.log_messages_signal.emit(self.log_messages)
+        self.append_log_message(LOG_LEVEL_SERVER_ERROR, LOG_SOURCE_SERVER, message, f'<span style="color:red">[Server]{message}</span>')
+
+    def append_log_message(self, level, source, message, entry):
+        # Only the new entry is sent, the view appends it instead of re-rendering the whole log
+        self.log_messages.append(entry)
+        self.log_messages_signal.emit(entry)
+        if self.log_writer is not None:
+            self.log_writer.enqueue_log(level, source, message)
+
+    def set_log_writer(self, writer):
+        self.log_writer = writer
+
+    def get_log_messages(self):
+        return list(self.log_messages)
 
     def set_connection_state(self, connected):
         self.connectionState = connected
@@ -85,6 +102,9 @@ class LgClientModel(QtCore.QObject):
     
     def set_target_order(self, target):
         self.target_order = target
+
+    def get_target_order(self):
+        return self.target_order
         
     def set_laser_state(self, enabled):
         self.laser_state_signal.emit(enabled)
@@ -92,11 +112,18 @@ class LgClientModel(QtCore.QObject):
     def set_calibrate_state(self, enabled):
         self.calibrate_state_signal.emit(enabled)
     
-    def set_image(self, image):
-        self.process_image_signal.emit(image)
+    def set_image(self, image, frame_info=None):
+        self.process_image_signal.emit(image, frame_info)
         
+    def set_performance_stats(self, stats):
+        self.performance_stats_signal.emit(stats)
+
     def set_algo(self, algo):
+        self.algorithm = algo
         self.algorithm_select_signal.emit(algo)
+
+    def get_algo(self):
+        return self.algorithm
         
     def set_robot_action(self, action):
         self.robot_action_signal.emit(action)
@@ -108,4 +135,7 @@ class LgClientModel(QtCore.QObject):
         self.record_video_signal.emit(record)
         
     def set_hit_number(self, number):
-        self.hit_number_siganl.emit(number)
\ No newline at end of file
+        self.hit_number_siganl.emit(number)
+
+    def set_video_size(self, width, height):
+        self.video_size_signal.emit(width, height)
\ No newline at end of file
@@ -0,0 +1,203 @@
+import struct
+import constant.NetworkConfig as Network
+
+# Framing of the Message.h types: a !II header (payload length, message type) followed by the payload.
+# The Struct instances are built once. MessageEncoder packs messages back to back into one reused buffer,
+# and MessageDecoder receives into one reused buffer and splits out every complete message in it.
+
+MESSAGE_HEADER = struct.Struct('!II')
+UINT_PAYLOAD = struct.Struct('!I')
+BYTE_PAYLOAD = struct.Struct('B')
+# Header and payload of the fixed-size messages, packed with a single call
+UINT_MESSAGE = struct.Struct('!III')
+BYTE_MESSAGE = struct.Struct('!IIB')
+
+PAYLOAD_BYTES = 0
+PAYLOAD_UINT = 1
+PAYLOAD_BYTE = 2
+# NUL terminated strings, the terminator is counted in the payload length as in DemoCannon.cpp
+PAYLOAD_STRING = 3
+PAYLOAD_ASCII = 4
+
+MESSAGE_PAYLOAD_DICT = {
+    Network.MT_COMMANDS: PAYLOAD_BYTE,
+    Network.MT_TARGET_SEQUENCE: PAYLOAD_STRING,
+    Network.MT_IMAGE: PAYLOAD_BYTES,
+    Network.MT_TEXT: PAYLOAD_STRING,
+    Network.MT_PREARM: PAYLOAD_STRING,
+    Network.MT_STATE: PAYLOAD_UINT,
+    Network.MT_STATE_CHANGE_REQ: PAYLOAD_UINT,
+    Network.MT_CALIB_COMMANDS: PAYLOAD_BYTE,
+    Network.MT_CONFIG: PAYLOAD_ASCII,
+}
+
+def get_payload_kind(msg_type):
+    # Unknown types are passed through as raw bytes
+    return MESSAGE_PAYLOAD_DICT.get(msg_type, PAYLOAD_BYTES)
+
+def encode_string(text, kind):
+    return text.encode('ascii' if kind == PAYLOAD_ASCII else 'utf-8') + b'\0'
+
+def encode_payload(msg_type, value):
+    kind = get_payload_kind(msg_type)
+    if kind == PAYLOAD_UINT:
+        return UINT_PAYLOAD.pack(value)
+    if kind == PAYLOAD_BYTE:
+        return BYTE_PAYLOAD.pack(value)
+    if kind == PAYLOAD_BYTES:
+        return value
+    return encode_string(value, kind)
+
+def pack_message(msg_type, payload):
+    message = bytearray(MESSAGE_HEADER.size + len(payload))
+    MESSAGE_HEADER.pack_into(message, 0, len(payload), msg_type)
+    message[MESSAGE_HEADER.size:] = payload
+    return message
+
+def decode_uint(payload, structure):
+    # Payloads of an unexpected length are read as one big-endian number, as the receiver always did
+    if len(payload) == structure.size:
+        return structure.unpack_from(payload)[0]
+    return int.from_bytes(payload, byteorder='big')
+
+def decode_payload(msg_type, payload):
+    # Strings stop at the first NUL, raw payloads are returned as given and may be a view into a reused buffer
+    kind = get_payload_kind(msg_type)
+    if kind == PAYLOAD_UINT:
+        return decode_uint(payload, UINT_PAYLOAD)
+    if kind == PAYLOAD_BYTE:
+        return decode_uint(payload, BYTE_PAYLOAD)
+    if kind == PAYLOAD_BYTES:
+        return payload
+    text = bytes(payload).split(b'\0', 1)[0]
+    return text.decode('ascii' if kind == PAYLOAD_ASCII else 'utf-8', errors='replace')
+
+class MessageEncoder:
+    def __init__(self, capacity=Network.SEND_BUFFER_INITIAL_SIZE):
+        self.buffer = bytearray(capacity)
+        # Payload copies go through the view, slice assignment on a memoryview is much cheaper than on the bytearray
+        self.view = memoryview(self.buffer)
+        self.size = 0
+        # One bound packer per type, unknown types are packed as raw bytes
+        self.packer_dict = {Network.MT_COMMANDS: self.add_byte, Network.MT_CALIB_COMMANDS: self.add_byte,
+                            Network.MT_STATE: self.add_uint, Network.MT_STATE_CHANGE_REQ: self.add_uint,
+                            Network.MT_TARGET_SEQUENCE: self.add_string, Network.MT_PREARM: self.add_string,
+                            Network.MT_TEXT: self.add_string, Network.MT_CONFIG: self.add_ascii}
+
+    def grow(self, size):
+        capacity = len(self.buffer)
+        while capacity < self.size + size:
+            capacity *= 2
+        buffer = bytearray(capacity)
+        buffer[:self.size] = self.view[:self.size]
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+
+    # The size only moves once a message is fully written, so a bad value never leaves a partial message
+    def add(self, msg_type, value):
+        packer = self.packer_dict.get(msg_type)
+        if packer is None:
+            self.add_payload(msg_type, value)
+        else:
+            packer(msg_type, value)
+
+    def add_uint(self, msg_type, value):
+        offset = self.size
+        if offset + UINT_MESSAGE.size > len(self.buffer):
+            self.grow(UINT_MESSAGE.size)
+        UINT_MESSAGE.pack_into(self.buffer, offset, UINT_PAYLOAD.size, msg_type, value)
+        self.size = offset + UINT_MESSAGE.size
+
+    def add_byte(self, msg_type, value):
+        offset = self.size
+        if offset + BYTE_MESSAGE.size > len(self.buffer):
+            self.grow(BYTE_MESSAGE.size)
+        BYTE_MESSAGE.pack_into(self.buffer, offset, BYTE_PAYLOAD.size, msg_type, value)
+        self.size = offset + BYTE_MESSAGE.size
+
+    def add_string(self, msg_type, text, encoding='utf-8'):
+        # Written as payload and terminator, without building the NUL terminated copy first
+        data = text.encode(encoding)
+        payload_start = self.size + MESSAGE_HEADER.size
+        end = payload_start + len(data) + 1
+        if end > len(self.buffer):
+            self.grow(end - self.size)
+        MESSAGE_HEADER.pack_into(self.buffer, self.size, len(data) + 1, msg_type)
+        self.view[payload_start:end - 1] = data
+        self.buffer[end - 1] = 0
+        self.size = end
+
+    def add_ascii(self, msg_type, text):
+        self.add_string(msg_type, text, 'ascii')
+
+    def add_payload(self, msg_type, payload):
+        payload_start = self.size + MESSAGE_HEADER.size
+        end = payload_start + len(payload)
+        if end > len(self.buffer):
+            self.grow(end - self.size)
+        MESSAGE_HEADER.pack_into(self.buffer, self.size, len(payload), msg_type)
+        self.view[payload_start:end] = payload
+        self.size = end
+
+    def get_view(self):
+        return self.view[:self.size]
+
+    def clear(self):
+        self.size = 0
+
+class MessageDecoder:
+    # A burst of small MT_TEXT/MT_STATE messages is read with one recv instead of two per message.
+    # Payload views point into the buffer and are only valid until the next get_receive_view call.
+    def __init__(self, capacity=Network.RECV_BUFFER_INITIAL_SIZE):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        # Unparsed bytes are buffer[start:end]
+        self.start = 0
+        self.end = 0
+
+    def get_pending_header(self):
+        # (payload length, message type) of the message being received, None until its header is in
+        if self.end - self.start < MESSAGE_HEADER.size:
+            return None
+        return MESSAGE_HEADER.unpack_from(self.buffer, self.start)
+
+    def get_receive_view(self):
+        if self.start == self.end:
+            self.start = self.end = 0
+        header = self.get_pending_header()
+        message_size = MESSAGE_HEADER.size + header[0] if header is not None else MESSAGE_HEADER.size
+        pending = self.end - self.start
+        free = len(self.buffer) - self.end
+        if free < max(message_size - pending, Network.RECV_BUFFER_MIN_FREE):
+            self.compact(message_size)
+        return self.view[self.end:]
+
+    def compact(self, message_size):
+        # Moves the partial message to the front, growing the buffer when the whole message would not fit
+        pending = self.end - self.start
+        capacity = len(self.buffer)
+        while capacity < message_size or capacity - pending < Network.RECV_BUFFER_MIN_FREE:
+            capacity *= 2
+        if capacity != len(self.buffer):
+            buffer = bytearray(capacity)
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        else:
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+        self.start = 0
+        self.end = pending
+
+    def commit(self, nbytes):
+        self.end += nbytes
+
+    def read_messages(self):
+        # Yields (message type, payload view) for every complete message received so far
+        while self.end - self.start >= MESSAGE_HEADER.size:
+            msg_len, msg_type = MESSAGE_HEADER.unpack_from(self.buffer, self.start)
+            payload_start = self.start + MESSAGE_HEADER.size
+            payload_end = payload_start + msg_len
+            if payload_end > self.end:
+                return
+            self.start = payload_end
+            yield msg_type, self.view[payload_start:payload_end]
@@ -0,0 +1,216 @@
+import os
+import struct
+
+# Writers for recording the received JPEG bitstream as-is, without decoding or re-encoding.
+# MjpegAviWriter produces an AVI 1.0 MJPEG file that OpenCV and common players open,
+# MjpegStreamWriter a raw length-prefixed stream with a binary timestamp index next to it.
+# AVI files get a .ts sidecar of per-frame capture times, since the container rate is only nominal.
+
+AVI_MAX_BYTES = 1 << 30     # AVI 1.0 offsets are 32-bit, files are split well before that
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+AVI_HEADER_CHUNK = struct.Struct('<4sI')
+AVI_INDEX_ENTRY = struct.Struct('<4sIII')
+
+# Raw stream record header: payload length, capture time in ns relative to the first frame
+STREAM_RECORD_HEADER = struct.Struct('!IQ')
+# Index entry: capture time in ns relative to the first frame, record offset, payload length
+STREAM_INDEX_ENTRY = struct.Struct('!QQI')
+STREAM_INDEX_SUFFIX = ".idx"
+
+# Timestamp sidecar: capture time in ns relative to the first frame, one entry per frame
+TIMESTAMP_ENTRY = struct.Struct('!Q')
+TIMESTAMP_SUFFIX = ".ts"
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def get_jpeg_size(data):
+    # Walks the marker segments up to the first start-of-frame, returns (width, height) or None
+    length = len(data)
+    if length < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    offset = 2
+    while offset + 4 <= length:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        segment_length = (data[offset + 2] << 8) | data[offset + 3]
+        if marker in JPEG_SOF_MARKERS and offset + 9 <= length:
+            height = (data[offset + 5] << 8) | data[offset + 6]
+            width = (data[offset + 7] << 8) | data[offset + 8]
+            return width, height
+        offset += 2 + segment_length
+    return None
+
+class TimestampWriter:
+    def __init__(self, path):
+        self.file = open(path + TIMESTAMP_SUFFIX, "wb")
+        self.first_timestamp = None
+        self.last_timestamp = 0
+
+    def write(self, timestamp_ns):
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp_ns
+        self.last_timestamp = timestamp_ns - self.first_timestamp
+        self.file.write(TIMESTAMP_ENTRY.pack(self.last_timestamp))
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def read_timestamps(path):
+    # Per-frame capture times in seconds from the .ts sidecar or the raw stream index, None if neither exists
+    if os.path.exists(path + TIMESTAMP_SUFFIX):
+        with open(path + TIMESTAMP_SUFFIX, "rb") as file:
+            data = file.read()
+        return [entry[0] / 1e9 for entry in TIMESTAMP_ENTRY.iter_unpack(data[:len(data) - len(data) % TIMESTAMP_ENTRY.size])]
+    if os.path.exists(path + STREAM_INDEX_SUFFIX):
+        with open(path + STREAM_INDEX_SUFFIX, "rb") as file:
+            data = file.read()
+        return [entry[0] / 1e9 for entry in STREAM_INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % STREAM_INDEX_ENTRY.size])]
+    return None
+
+class MjpegAviWriter:
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.file = None
+        self.frame_size = None
+        self.frame_count = 0
+        self.max_frame_bytes = 0
+        self.index = bytearray()
+        self.movi_offset = 0
+        self.file_names = []
+        self.segment = 0
+        self.timestamp_writer = None
+
+    def is_opened(self):
+        return True
+
+    def get_segment_path(self):
+        if self.segment == 0:
+            return self.path
+        root, extension = os.path.splitext(self.path)
+        return f"{root}_{self.segment:03d}{extension}"
+
+    def open_segment(self, frame_size):
+        segment_path = self.get_segment_path()
+        self.file = open(segment_path, "wb")
+        self.timestamp_writer = TimestampWriter(segment_path)
+        self.file_names.append(os.path.basename(segment_path))
+        self.frame_size = frame_size
+        self.frame_count = 0
+        self.max_frame_bytes = 0
+        self.index = bytearray()
+        self.write_headers()
+        self.file.write(b'LIST\0\0\0\0movi')
+        self.movi_offset = self.file.tell() - 4
+
+    def write_headers(self):
+        # Sizes and counts are placeholders until finish_segment patches them in place
+        width, height = self.frame_size
+        microseconds_per_frame = int(round(1000000 / self.fps))
+        avih = struct.pack('<14I', microseconds_per_frame, 0, 0, AVIF_HASINDEX, 0, 0, 1, 0, width, height, 0, 0, 0, 0)
+        strh = struct.pack('<4s4sIHHIIIIIIII4h', b'vids', b'MJPG', 0, 0, 0, 0, 1000, int(round(self.fps * 1000)),
+                           0, 0, 0, 0xFFFFFFFF, 0, 0, 0, width, height)
+        strf = struct.pack('<IiiHH4sIiiII', 40, width, height, 1, 24, b'MJPG', width * height * 3, 0, 0, 0, 0)
+        strl = b'strl' + self.chunk(b'strh', strh) + self.chunk(b'strf', strf)
+        hdrl = b'hdrl' + self.chunk(b'avih', avih) + self.chunk(b'LIST', strl)
+        self.file.write(b'RIFF\0\0\0\0AVI ' + self.chunk(b'LIST', hdrl))
+
+    def chunk(self, fourcc, data):
+        padding = b'\0' if len(data) % 2 else b''
+        return AVI_HEADER_CHUNK.pack(fourcc, len(data)) + data + padding
+
+    def write(self, data, timestamp_ns=0):
+        if self.file is None:
+            frame_size = get_jpeg_size(data)
+            if frame_size is None:
+                return False
+            self.open_segment(frame_size)
+        elif self.file.tell() + len(data) > AVI_MAX_BYTES:
+            self.finish_segment()
+            self.segment += 1
+            self.open_segment(self.frame_size)
+        offset = self.file.tell() - self.movi_offset
+        self.file.write(AVI_HEADER_CHUNK.pack(b'00dc', len(data)))
+        self.file.write(data)
+        if len(data) % 2:
+            self.file.write(b'\0')
+        self.index += AVI_INDEX_ENTRY.pack(b'00dc', AVIIF_KEYFRAME, offset, len(data))
+        self.timestamp_writer.write(timestamp_ns)
+        self.frame_count += 1
+        self.max_frame_bytes = max(self.max_frame_bytes, len(data))
+        return True
+
+    def finish_segment(self):
+        movi_end = self.file.tell()
+        self.file.write(self.chunk(b'idx1', bytes(self.index)))
+        file_end = self.file.tell()
+        self.file.seek(4)
+        self.file.write(struct.pack('<I', file_end - 8))
+        # Nominal rate from the measured average, for players that ignore the .ts sidecar
+        fps = self.fps
+        if self.frame_count > 1 and self.timestamp_writer.last_timestamp > 0:
+            fps = (self.frame_count - 1) * 1e9 / self.timestamp_writer.last_timestamp
+        self.file.seek(32)
+        self.file.write(struct.pack('<I', int(round(1000000 / fps))))
+        self.file.seek(132)
+        self.file.write(struct.pack('<I', int(round(fps * 1000))))
+        # avih dwTotalFrames and dwSuggestedBufferSize
+        self.file.seek(48)
+        self.file.write(struct.pack('<I', self.frame_count))
+        self.file.seek(60)
+        self.file.write(struct.pack('<I', self.max_frame_bytes))
+        # strh dwLength and dwSuggestedBufferSize
+        self.file.seek(140)
+        self.file.write(struct.pack('<II', self.frame_count, self.max_frame_bytes))
+        self.file.seek(self.movi_offset - 4)
+        self.file.write(struct.pack('<I', movi_end - self.movi_offset))
+        self.file.close()
+        self.file = None
+        self.timestamp_writer.release()
+
+    def get_time_origin(self):
+        # Segment that frames are currently written to and its first frame time, None before any frame
+        first_timestamp = self.timestamp_writer.first_timestamp if self.file is not None else None
+        return self.get_segment_path(), first_timestamp
+
+    def release(self):
+        if self.file is not None:
+            self.finish_segment()
+
+class MjpegStreamWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.index_file = open(path + STREAM_INDEX_SUFFIX, "wb")
+        self.first_timestamp = None
+        self.file_names = [os.path.basename(path)]
+
+    def is_opened(self):
+        return self.file is not None
+
+    def write(self, data, timestamp_ns=0):
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp_ns
+        relative = timestamp_ns - self.first_timestamp
+        offset = self.file.tell()
+        self.file.write(STREAM_RECORD_HEADER.pack(len(data), relative))
+        self.file.write(data)
+        self.index_file.write(STREAM_INDEX_ENTRY.pack(relative, offset, len(data)))
+        return True
+
+    def get_time_origin(self):
+        return self.path, self.first_timestamp
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.index_file.close()
+            self.file = None
+            self.index_file = None
@@ -0,0 +1,170 @@
+import time
+import threading
+from collections import deque, OrderedDict
+import numpy as np
+from PyQt5 import QtCore
+from PyQt5.QtGui import QImage
+from constant.DisplayConstant import PLAYER_READ_AHEAD_FRAMES, PLAYER_MAX_DISPLAY_FPS, PLAYER_FRAME_CACHE_MB
+
+class PlaybackClock:
+    # Media position derived from the wall clock, shared by the player and its decoder thread.
+    # A negative rate plays in reverse.
+    def __init__(self):
+        self.start_time = 0.0
+        self.start_position = 0.0
+        self.rate = 1.0
+
+    def start(self, position, rate=None):
+        self.start_time = time.monotonic()
+        self.start_position = position
+        if rate is not None:
+            self.rate = rate
+
+    def get_position(self):
+        return self.start_position + (time.monotonic() - self.start_time) * self.rate
+
+    def get_direction(self):
+        return 1 if self.rate >= 0 else -1
+
+class FrameCache:
+    # Least recently used display-ready frames, bounded by memory rather than count
+    def __init__(self, capacityBytes=PLAYER_FRAME_CACHE_MB * 1024 * 1024):
+        self.capacity_bytes = capacityBytes
+        self.used_bytes = 0
+        self.images = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, index):
+        with self.lock:
+            image = self.images.get(index)
+            if image is None:
+                self.misses += 1
+                return None
+            self.images.move_to_end(index)
+            self.hits += 1
+            return image
+
+    def put(self, index, image):
+        with self.lock:
+            if index in self.images:
+                return
+            self.images[index] = image
+            self.used_bytes += image.sizeInBytes()
+            while self.used_bytes > self.capacity_bytes and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.used_bytes -= evicted.sizeInBytes()
+
+def decode_image(source, index, cache=None):
+    # Converted to the native pixmap format here, so the GUI thread only wraps it
+    if cache is not None:
+        image = cache.get(index)
+        if image is not None:
+            return image
+    frame = source.read(index)
+    if frame is None:
+        return None
+    image = QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_BGR888)
+    image = image.convertToFormat(QImage.Format_RGB32)
+    if cache is not None:
+        cache.put(index, image)
+    return image
+
+class PlaybackDecoder(QtCore.QThread):
+    # Decodes frames ahead of the playback clock into a bounded buffer of display-ready images.
+    # Frames the clock has already passed are skipped, and above the display rate only every
+    # frame that will actually be shown is decoded.
+    def __init__(self, source, clock, startIndex, cache=None, readAhead=PLAYER_READ_AHEAD_FRAMES):
+        super().__init__()
+        self.source = source
+        self.clock = clock
+        self.cache = cache
+        self.read_ahead = readAhead
+        self.condition = threading.Condition()
+        self.buffer = deque()
+        self.next_index = startIndex
+        # Bumped on every seek, frames decoded for an older position are discarded
+        self.generation = 0
+        self.decoding = False
+        self.running = True
+        self.decoded_frames = 0
+        self.skipped_frames = 0
+        self.dropped_frames = 0
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: not self.running or
+                                        (len(self.buffer) < self.read_ahead and self.has_next_index()))
+                if not self.running:
+                    break
+                index = self.next_index
+                direction = self.clock.get_direction()
+                due_index = self.get_due_index()
+                if (due_index - index) * direction > 0:
+                    self.skipped_frames += abs(due_index - index)
+                    index = due_index
+                self.next_index = self.get_following_index(index)
+                self.decoding = True
+                generation = self.generation
+            image = decode_image(self.source, index, self.cache)
+            with self.condition:
+                self.decoding = False
+                self.decoded_frames += 1
+                if image is not None and generation == self.generation:
+                    self.buffer.append((index, float(self.source.frame_times[index]), image))
+                    self.condition.notify_all()
+
+    def has_next_index(self):
+        return 0 <= self.next_index < self.source.frame_count
+
+    def get_due_index(self):
+        # Frame the clock is showing right now, in the playback direction
+        frame_times = self.source.frame_times
+        position = self.clock.get_position()
+        if self.clock.get_direction() > 0:
+            return int(np.searchsorted(frame_times, position, side="right")) - 1
+        return int(np.searchsorted(frame_times, position, side="left"))
+
+    def get_following_index(self, index):
+        # Next frame at least one display interval of media time away, at 1x this is simply the adjacent frame
+        frame_times = self.source.frame_times
+        step = abs(self.clock.rate) / PLAYER_MAX_DISPLAY_FPS
+        # Strides stop on the end frame, so fast playback always lands on the first or last frame
+        if self.clock.get_direction() > 0:
+            following = max(index + 1, int(np.searchsorted(frame_times, frame_times[index] + step, side="left")))
+            return min(following, self.source.frame_count - 1) if index < self.source.frame_count - 1 else following
+        following = min(index - 1, int(np.searchsorted(frame_times, frame_times[index] - step, side="right")) - 1)
+        return max(following, 0) if index > 0 else following
+
+    def seek(self, index):
+        with self.condition:
+            self.generation += 1
+            self.buffer.clear()
+            self.next_index = index
+            self.condition.notify_all()
+
+    def take_due_frame(self, position):
+        # Returns the newest frame due at position, or None, and the time of the next buffered frame
+        direction = self.clock.get_direction()
+        entry = None
+        with self.condition:
+            while self.buffer and (self.buffer[0][1] - position) * direction <= 0:
+                if entry is not None:
+                    self.dropped_frames += 1
+                entry = self.buffer.popleft()
+            next_time = self.buffer[0][1] if self.buffer else None
+            self.condition.notify_all()
+        return entry, next_time
+
+    def is_finished(self):
+        with self.condition:
+            return not self.buffer and not self.decoding and not self.has_next_index()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.buffer.clear()
+            self.condition.notify_all()
+        self.wait()
@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import deque
+
+class PriorityEventQueue:
+    # One FIFO per lane, get() always serves the lowest-numbered non-empty lane first
+    def __init__(self, lanes):
+        self.lanes = list(lanes)
+        self.queues = {lane: deque() for lane in self.lanes}
+        self.condition = threading.Condition()
+        self.wait_total = {lane: 0.0 for lane in self.lanes}
+        self.wait_max = {lane: 0.0 for lane in self.lanes}
+        self.wait_last = {lane: 0.0 for lane in self.lanes}
+        self.dispatched = {lane: 0 for lane in self.lanes}
+
+    def put(self, lane, event):
+        with self.condition:
+            self.queues[lane].append((time.monotonic(), event))
+            self.condition.notify()
+
+    def get(self):
+        with self.condition:
+            while True:
+                for lane in self.lanes:
+                    if self.queues[lane]:
+                        enqueued, event = self.queues[lane].popleft()
+                        self.record_wait(lane, time.monotonic() - enqueued)
+                        return event
+                self.condition.wait()
+
+    def has_pending(self, lane, predicate):
+        with self.condition:
+            return any(predicate(event) for _, event in self.queues[lane])
+
+    def record_wait(self, lane, waited):
+        self.wait_last[lane] = waited
+        self.wait_total[lane] += waited
+        self.wait_max[lane] = max(self.wait_max[lane], waited)
+        self.dispatched[lane] += 1
+
+    def qsize(self):
+        with self.condition:
+            return sum(len(queue) for queue in self.queues.values())
+
+    def get_lane_stats(self):
+        # lane -> (queue depth, last wait, average wait, max wait), waits in seconds
+        with self.condition:
+            stats = {}
+            for lane in self.lanes:
+                dispatched = self.dispatched[lane]
+                average = self.wait_total[lane] / dispatched if dispatched else 0.0
+                stats[lane] = (len(self.queues[lane]), self.wait_last[lane], average, self.wait_max[lane])
+            return stats
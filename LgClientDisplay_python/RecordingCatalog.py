@@ -0,0 +1,100 @@
+import os
+import sqlite3
+from datetime import datetime
+from constant.DisplayConstant import RECORD_CATALOG_FILE_NAME, RECORD_VIDEO_EXTENSION_LIST
+from VideoIndex import open_video_source, get_video_duration
+from EventTrack import EVENT_TYPE_HIT, EVENT_TYPE_MISS, EVENT_TYPE_INFO, read_events
+
+# One row per playable file in the recordings directory. Every column is derived from the files
+# themselves (frame index, .ts and .events.jsonl sidecars), so a lost catalog is rebuilt by sync().
+
+CATALOG_COLUMN_LIST = ["file_name", "recorded_at", "duration", "frame_count", "width", "height",
+                       "target_order", "hit_count", "miss_count", "algorithm", "file_size", "mtime_ns"]
+CATALOG_SEARCH_COLUMN_LIST = ["file_name", "recorded_at", "target_order", "algorithm"]
+
+class RecordingCatalog:
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, RECORD_CATALOG_FILE_NAME)
+
+    def connect(self):
+        # One short-lived connection per call, the recorder thread and the player use the catalog concurrently
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.row_factory = sqlite3.Row
+        connection.execute("CREATE TABLE IF NOT EXISTS recordings (file_name TEXT PRIMARY KEY, recorded_at TEXT, "
+                           "duration REAL, frame_count INTEGER, width INTEGER, height INTEGER, target_order TEXT, "
+                           "hit_count INTEGER, miss_count INTEGER, algorithm TEXT, file_size INTEGER, mtime_ns INTEGER)")
+        return connection
+
+    def read_metadata(self, file_name):
+        path = os.path.join(self.directory, file_name)
+        stat = os.stat(path)
+        metadata = {"file_name": file_name, "recorded_at": datetime.fromtimestamp(stat.st_mtime).isoformat(" ", "seconds"),
+                    "duration": 0.0, "frame_count": 0, "width": 0, "height": 0, "target_order": "",
+                    "hit_count": 0, "miss_count": 0, "algorithm": "", "file_size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        source = open_video_source(path)
+        if source is not None:
+            metadata["frame_count"] = source.frame_count
+            metadata["duration"] = round(get_video_duration(source.frame_times), 3)
+            frame_size = source.get_frame_size()
+            if frame_size is not None:
+                metadata["width"], metadata["height"] = frame_size
+            source.release()
+        for event in read_events(path):
+            if event["type"] == EVENT_TYPE_HIT:
+                metadata["hit_count"] += 1
+            elif event["type"] == EVENT_TYPE_MISS:
+                metadata["miss_count"] += 1
+            elif event["type"] == EVENT_TYPE_INFO:
+                # Later info events override earlier ones, the last target order and algorithm win
+                metadata["target_order"] = event.get("target_order") or metadata["target_order"]
+                metadata["algorithm"] = event.get("algorithm") or metadata["algorithm"]
+        return metadata
+
+    def update_recordings(self, file_names):
+        rows = [self.read_metadata(file_name) for file_name in file_names
+                if os.path.exists(os.path.join(self.directory, file_name))]
+        if not rows:
+            return
+        placeholders = ", ".join("?" * len(CATALOG_COLUMN_LIST))
+        with self.connect() as connection:
+            connection.executemany(f"INSERT OR REPLACE INTO recordings ({', '.join(CATALOG_COLUMN_LIST)}) VALUES ({placeholders})",
+                                   [[row[column] for column in CATALOG_COLUMN_LIST] for row in rows])
+        connection.close()
+
+    def sync(self, skip_file_names=()):
+        # Only files that are new or changed since they were cataloged are opened, returns whether anything changed.
+        # skip_file_names are files still being recorded, they are cataloged by the recorder once finished.
+        if not os.path.isdir(self.directory):
+            return False
+        with self.connect() as connection:
+            known = {row["file_name"]: (row["file_size"], row["mtime_ns"])
+                     for row in connection.execute("SELECT file_name, file_size, mtime_ns FROM recordings")}
+        connection.close()
+        present = {}
+        for entry in os.scandir(self.directory):
+            if entry.name in skip_file_names:
+                continue
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in RECORD_VIDEO_EXTENSION_LIST:
+                stat = entry.stat()
+                present[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        changed = [name for name, key in present.items() if known.get(name) != key]
+        removed = [name for name in known if name not in present and name not in skip_file_names]
+        if removed:
+            with self.connect() as connection:
+                connection.executemany("DELETE FROM recordings WHERE file_name = ?", [[name] for name in removed])
+            connection.close()
+        self.update_recordings(changed)
+        return bool(changed or removed)
+
+    def search(self, text=""):
+        query = "SELECT * FROM recordings"
+        parameters = []
+        if text:
+            query += " WHERE " + " OR ".join(f"{column} LIKE ?" for column in CATALOG_SEARCH_COLUMN_LIST)
+            parameters = [f"%{text}%"] * len(CATALOG_SEARCH_COLUMN_LIST)
+        query += " ORDER BY recorded_at DESC, file_name DESC"
+        with self.connect() as connection:
+            rows = [dict(row) for row in connection.execute(query, parameters)]
+        connection.close()
+        return rows
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import queue
+from datetime import datetime
+from PyQt5 import QtCore
+from constant.DisplayConstant import SESSION_LOG_FILE_LOCATION, SESSION_LOG_MAX_FILE_BYTES, SESSION_LOG_BATCH_SIZE, \
+                                    SESSION_LOG_FLUSH_INTERVAL, LOG_LEVEL_LIST
+
+# Each log file <name>.jsonl has a companion <name>.idx with one line per written batch:
+# byte offset/length of the batch, its time range and a bitmask of the levels it contains.
+LOG_FILE_EXTENSION = ".jsonl"
+INDEX_FILE_EXTENSION = ".idx"
+
+class SessionLogWriter(QtCore.QThread):
+    def __init__(self):
+        super().__init__()
+        self.event_queue_log = queue.Queue()
+        self.directory = os.path.join(os.getcwd(), SESSION_LOG_FILE_LOCATION)
+        self.ensure_directory_exists(self.directory)
+        self.session_name = "log_" + datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.part_number = 0
+        self.log_file = None
+        self.index_file = None
+        self.file_size = 0
+
+    def run(self):
+        running = True
+        while running:
+            entry = self.event_queue_log.get()
+            batch = []
+            # Gather whatever else arrives shortly after so the disk sees one write per batch
+            deadline = time.monotonic() + SESSION_LOG_FLUSH_INTERVAL
+            while entry is not None:
+                batch.append(entry)
+                if len(batch) >= SESSION_LOG_BATCH_SIZE:
+                    break
+                try:
+                    entry = self.event_queue_log.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if entry is None:
+                running = False
+            if batch:
+                self.write_batch(batch)
+        self.close_files()
+
+    # Queue Function
+    def enqueue_log(self, level, source, message):
+        self.event_queue_log.put((time.monotonic(), time.time(), level, source, message))
+
+    def enqueue_stop(self):
+        self.event_queue_log.put(None)
+
+    def ensure_directory_exists(self, directory):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def open_files(self):
+        self.close_files()
+        baseName = self.session_name if self.part_number == 0 else f"{self.session_name}_{self.part_number:03}"
+        self.log_file = open(os.path.join(self.directory, baseName + LOG_FILE_EXTENSION), "ab")
+        self.index_file = open(os.path.join(self.directory, baseName + INDEX_FILE_EXTENSION), "a")
+        self.file_size = self.log_file.tell()
+
+    def close_files(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+
+    def write_batch(self, batch):
+        if self.log_file is None:
+            self.open_files()
+        elif self.file_size >= SESSION_LOG_MAX_FILE_BYTES:
+            self.part_number += 1
+            self.open_files()
+
+        levels = 0
+        lines = []
+        for monotonic, wallTime, level, source, message in batch:
+            levels |= get_level_mask([level])
+            lines.append(json.dumps({"t": monotonic, "time": wallTime, "level": level, "source": source, "message": message}))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+
+        try:
+            self.log_file.write(data)
+            self.log_file.flush()
+            self.index_file.write(json.dumps({"offset": self.file_size, "length": len(data), "count": len(batch),
+                                              "t_start": batch[0][0], "t_end": batch[-1][0],
+                                              "time_start": batch[0][1], "time_end": batch[-1][1],
+                                              "levels": levels}) + "\n")
+            self.index_file.flush()
+            self.file_size += len(data)
+        except OSError as e:
+            print(f"Error writing session log: {e}")
+
+def get_level_mask(levels):
+    mask = 0
+    for level in levels:
+        if level in LOG_LEVEL_LIST:
+            mask |= 1 << LOG_LEVEL_LIST.index(level)
+    return mask
+
+def list_log_files(directory):
+    # Rotated parts sort after the first file of their session
+    names = [name[:-len(LOG_FILE_EXTENSION)] for name in os.listdir(directory) if name.endswith(LOG_FILE_EXTENSION)]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+def search_log(logPath, time_start=None, time_end=None, levels=None):
+    # logPath is a log file without extension; only batches whose index entry matches are read
+    levelMask = get_level_mask(levels) if levels is not None else -1
+    results = []
+    indexPath = logPath + INDEX_FILE_EXTENSION
+    if not os.path.exists(indexPath):
+        return results
+    with open(indexPath, "r") as indexFile, open(logPath + LOG_FILE_EXTENSION, "rb") as logFile:
+        for line in indexFile:
+            chunk = json.loads(line)
+            if time_start is not None and chunk["time_end"] < time_start:
+                continue
+            if time_end is not None and chunk["time_start"] > time_end:
+                continue
+            if not chunk["levels"] & levelMask:
+                continue
+            logFile.seek(chunk["offset"])
+            for entryLine in logFile.read(chunk["length"]).splitlines():
+                entry = json.loads(entryLine)
+                if time_start is not None and entry["time"] < time_start:
+                    continue
+                if time_end is not None and entry["time"] > time_end:
+                    continue
+                if levels is not None and entry["level"] not in levels:
+                    continue
+                results.append(entry)
+    return results
+
+def search_session_logs(directory, time_start=None, time_end=None, levels=None):
+    results = []
+    for logPath in list_log_files(directory):
+        results.extend(search_log(logPath, time_start, time_end, levels))
+    return results
@@ -1,11 +1,13 @@
 import socket
 import threading
-import struct
 import time
 import cv2
 import numpy as np
 import constant.NetworkConfig as Network
 import constant.SettingConstant as Setting
+from FrameMetrics import FRAME_MARK_RECEIVE_END, FRAME_MARK_DECODE_END
+from MessageCodec import MessageEncoder, MessageDecoder, decode_payload
+from MjpegWriter import get_jpeg_size
 
 class TcpSendReceiver:
     def __init__(self, host, port, connection_callback, image_callback, text_callback, state_callback, command_callback):
@@ -20,14 +22,50 @@ class TcpSendReceiver:
         self.text_callback = text_callback
         self.state_callback = state_callback
         self.command_callback = command_callback
+        self.message_decoder = MessageDecoder()
+        # Latest-frame-wins mailbox between the socket reader and the decode worker
+        self.frame_condition = threading.Condition()
+        self.pending_frame = None
+        self.frame_buffers = []
+        self.decode_thread = None
+        self.received_frames = 0
+        self.decoded_frames = 0
+        self.dropped_frames = 0
+        self.received_bytes = 0
+        self.decode_seconds = 0.0
+        # Target (width, height) for decoded frames, None decodes at source size
+        self.decode_size = None
+        self.source_size = None
+        # Outgoing messages are encoded into one buffer and written with one sendall per wakeup of the send thread,
+        # callers encode into the other buffer of the pair while a write is in progress
+        self.send_condition = threading.Condition()
+        self.send_encoder = MessageEncoder()
+        self.spare_encoder = MessageEncoder()
+        self.send_thread = None
+        self.pending_starts = set()
+        self.send_dropped = 0
+        self.send_overflow = False
+        self.disconnect_lock = threading.Lock()
+        self.disconnecting = False
+        self.frame_metrics = None
+        self.frame_info = None
+        # Started when the header of a frame arrives ahead of its payload
+        self.receiving_frame_info = None
+        # Receives (jpeg bytes, receive time ns, frame_info) for pass-through recording, None when not recording
+        self.jpeg_callback = None
 
     def connect(self):
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
-        self.client_socket.settimeout(3)
+        self.client_socket.settimeout(Network.CONNECT_TIMEOUT_SEC)
         try:
             self.client_socket.connect((self.host, self.port))
             self.client_socket.settimeout(None)
+            self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.connected = True
+            self.decode_thread = threading.Thread(target=self.decode_frames)
+            self.decode_thread.start()
+            self.send_thread = threading.Thread(target=self.send_data)
+            self.send_thread.start()
             self.recv_thread = threading.Thread(target=self.recv_data)
             self.recv_thread.start()
             self.connection_callback(Network.NETWORK_CONNECTED)
@@ -37,9 +75,22 @@ class TcpSendReceiver:
         return self.connected
 
     def disconnect(self):
+        with self.disconnect_lock:
+            if self.disconnecting:
+                return
+            self.disconnecting = True
         self.connected = False
         self.stop_event.set()
+        with self.frame_condition:
+            self.frame_condition.notify_all()
+        with self.send_condition:
+            self.send_condition.notify_all()
         if self.client_socket:
+            try:
+                # Wakes a recv blocked in another thread, close() alone does not on Linux
+                self.client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             self.client_socket.close()
             self.client_socket = None
         if self.state_callback:
@@ -49,134 +100,276 @@ class TcpSendReceiver:
         self.image_callback = None
         self.text_callback = None
         self.state_callback = None
-        if self.recv_thread is not None:
-            try:
-                self.recv_thread.join()
-            except RuntimeError as e:
-                print(f"Error joining thread: {e}")
-            except Exception as e:
-                print(f"Unexpected error joining thread: {e}")
+        self.join_thread(self.recv_thread)
+        self.join_thread(self.send_thread)
+        self.join_thread(self.decode_thread)
 
-    def send_message(self, msg_type, msg_data):
-        if not self.connected:
+    def join_thread(self, thread):
+        if thread is None or thread is threading.current_thread():
             return
-        msg_len = len(msg_data)
-        msg_header = struct.pack('!II', msg_len, msg_type)
-        message = msg_header + msg_data
+        try:
+            thread.join()
+        except RuntimeError as e:
+            print(f"Error joining thread: {e}")
+        except Exception as e:
+            print(f"Unexpected error joining thread: {e}")
 
-        total_sent = 0
-        while total_sent < len(message):
+    def send_message(self, msg_type, value):
+        # value is the payload as MessageCodec takes it for msg_type: an int, a str or bytes.
+        # Returns False when not connected or when the unsent backlog is over SEND_BUFFER_MAX_BYTES.
+        if not self.connected:
+            return False
+        with self.send_condition:
+            size = self.send_encoder.size
+            self.send_encoder.add(msg_type, value)
+            if self.send_encoder.size > Network.SEND_BUFFER_MAX_BYTES:
+                # The server has stopped reading, the message is taken back out rather than queued without bound
+                self.send_encoder.size = size
+                if not self.send_overflow:
+                    print("Send buffer full, dropping messages until the server reads again")
+                self.send_overflow = True
+                self.send_dropped += 1
+                return False
+            self.send_overflow = False
+            self.notify_sender()
+        return True
+
+    def get_send_dropped(self):
+        return self.send_dropped
+
+    def notify_sender(self):
+        # Called with send_condition held
+        self.send_condition.notify()
+
+    def take_send_buffer(self):
+        # Swaps the buffer pair, the returned encoder holds everything queued since the last write
+        with self.send_condition:
+            encoder = self.send_encoder
+            self.send_encoder = self.spare_encoder
+            self.spare_encoder = encoder
+            self.pending_starts.clear()
+            return encoder
+
+    def send_data(self):
+        while True:
+            with self.send_condition:
+                while self.send_encoder.size == 0 and not self.stop_event.is_set():
+                    self.send_condition.wait()
+                if self.stop_event.is_set():
+                    return
+            # Everything queued while the previous sendall was blocked goes out as one write
+            encoder = self.take_send_buffer()
+            client_socket = self.client_socket
             try:
-                sent = self.client_socket.send(message[total_sent:])
-                if sent == 0:
+                if client_socket is None:
                     raise RuntimeError("Socket connection broken")
-                total_sent += sent
-            except socket.error as e:
-                if e.errno == socket.EWOULDBLOCK:
-                    time.sleep(0.01)
-                else:
-                    self.disconnect()
-                    break
+                client_socket.sendall(encoder.get_view())
+            except (socket.error, RuntimeError) as e:
+                self.disconnect()
+                return
+            encoder.clear()
 
     def recv_data(self):
         while not self.stop_event.is_set():
             try:
-                msg_header = self.client_socket.recv(8)
-                if len(msg_header) < 8:
+                client_socket = self.client_socket
+                if client_socket is None:
+                    print("Socket is not connected, cannot receive data")
                     self.disconnect()
                     break
-
-                msg_len, msg_type = struct.unpack('!II', msg_header)
-                msg_data = b""
-                while len(msg_data) < msg_len:
-                    if self.client_socket is not None:
-                        chunk = self.client_socket.recv(msg_len - len(msg_data))
-                    else:
-                        self.disconnect()
-                        print("Socket is not connected, cannot receive data")
-                        return
-                    if not chunk:
-                        self.disconnect()
-                        break
-                    msg_data += chunk
-
-                if msg_type == Network.MT_STATE:
-                    self.process_state(msg_data)
-                elif msg_type == Network.MT_IMAGE:
-                    self.process_image(msg_data)
-                elif msg_type == Network.MT_TEXT:
-                    self.process_text(msg_data)
-                elif msg_type == Network.MT_COMMANDS:
-                    self.process_command(msg_data)
+                nbytes = client_socket.recv_into(self.message_decoder.get_receive_view())
+                if nbytes == 0:
+                    self.disconnect()
+                    break
+                self.process_received(nbytes)
 
             except socket.error as e:
                 self.disconnect()
                 break
 
+    def process_received(self, nbytes):
+        # One receive often completes several small messages, each is dispatched before the next receive
+        decoder = self.message_decoder
+        decoder.commit(nbytes)
+        for msg_type, msg_data in decoder.read_messages():
+            frame_info = self.receiving_frame_info
+            self.receiving_frame_info = None
+            if frame_info is None:
+                frame_info = self.start_frame_info(msg_type)
+            self.end_frame_info(frame_info)
+            self.dispatch_message(msg_type, msg_data)
+        header = decoder.get_pending_header()
+        if header is not None and self.receiving_frame_info is None:
+            self.receiving_frame_info = self.start_frame_info(header[1])
+
+    def dispatch_message(self, msg_type, msg_data):
+        self.received_bytes += Network.MSG_HEADER_SIZE + len(msg_data)
+        if msg_type == Network.MT_STATE:
+            self.process_state(msg_data)
+        elif msg_type == Network.MT_IMAGE:
+            self.process_image(msg_data)
+        elif msg_type == Network.MT_TEXT:
+            self.process_text(msg_data)
+        elif msg_type == Network.MT_COMMANDS:
+            self.process_command(msg_data)
+
+    def set_jpeg_callback(self, jpeg_callback):
+        self.jpeg_callback = jpeg_callback
+
+    def set_frame_metrics(self, frame_metrics):
+        self.frame_metrics = frame_metrics
+
+    def start_frame_info(self, msg_type):
+        frame_metrics = self.frame_metrics
+        if msg_type != Network.MT_IMAGE or frame_metrics is None:
+            return None
+        return frame_metrics.start_frame()
+
+    def end_frame_info(self, frame_info):
+        # Picked up by process_image for the frame that was just read
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_RECEIVE_END)
+        self.frame_info = frame_info
+
     def process_state(self, state_data):
-        self.state_callback(int.from_bytes(state_data, byteorder='big'))
+        # msg_data points into the reused receive buffer, no process_* call may keep it after returning
+        self.state_callback(decode_payload(Network.MT_STATE, state_data))
 
     def process_image(self, img_data):
+        # Copy out of the receive buffer so the reader can go straight back to the socket
+        frame_size = len(img_data)
+        with self.frame_condition:
+            frame_buffer = self.frame_buffers.pop() if self.frame_buffers else None
+        if frame_buffer is None or len(frame_buffer) < frame_size:
+            frame_buffer = bytearray(frame_size)
+        frame_buffer[:frame_size] = img_data
+        frame_info = self.frame_info
+        self.frame_info = None
+        jpeg_callback = self.jpeg_callback
+        if jpeg_callback is not None:
+            jpeg_callback(bytes(img_data), time.monotonic_ns(), frame_info)
+        with self.frame_condition:
+            self.received_frames += 1
+            if self.pending_frame is not None:
+                self.frame_buffers.append(self.pending_frame[0])
+                self.dropped_frames += 1
+            self.pending_frame = (frame_buffer, frame_size, frame_info)
+            self.frame_condition.notify()
+
+    def decode_frames(self):
+        while True:
+            with self.frame_condition:
+                while self.pending_frame is None and not self.stop_event.is_set():
+                    self.frame_condition.wait()
+                if self.stop_event.is_set():
+                    return
+                frame_buffer, frame_size, frame_info = self.pending_frame
+                self.pending_frame = None
+            try:
+                self.decode_image(memoryview(frame_buffer)[:frame_size], frame_info)
+            except Exception as e:
+                # A failing consumer costs this frame only, the worker keeps decoding the live video
+                print(f"Error decoding frame: {e}")
+            with self.frame_condition:
+                self.decoded_frames += 1
+                self.frame_buffers.append(frame_buffer)
+
+    def decode_image(self, img_data, frame_info=None):
+        # Frames are delivered in BGR order, the display and recorder consume BGR directly
+        decode_start = time.perf_counter()
         np_arr = np.frombuffer(img_data, np.uint8)
-        image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        last_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        if image is not None and self.image_callback:
-            self.image_callback(last_image)
+        decode_size = self.decode_size
+        # Taken from the JPEG header, a reduced decode rounds odd sizes up so the scaled output size is not exact
+        jpeg_size = get_jpeg_size(img_data)
+        if jpeg_size is not None:
+            self.source_size = jpeg_size
+        decode_flag, scale = self.select_decode_flag(decode_size)
+        image = cv2.imdecode(np_arr, decode_flag)
+        if image is None:
+            return
+        height, width = image.shape[:2]
+        if jpeg_size is None:
+            self.source_size = (width * scale, height * scale)
+        if decode_size is not None and (width, height) != decode_size:
+            interpolation = cv2.INTER_AREA if width > decode_size[0] else cv2.INTER_LINEAR
+            image = cv2.resize(image, decode_size, interpolation=interpolation)
+        self.decode_seconds += time.perf_counter() - decode_start
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_DECODE_END)
+        image_callback = self.image_callback
+        if image_callback:
+            image_callback(image, frame_info)
+
+    def select_decode_flag(self, decode_size):
+        # Let libjpeg downscale while decoding when the target is at most 1/2 or 1/4 of the source
+        if decode_size is None or self.source_size is None:
+            return cv2.IMREAD_COLOR, 1
+        source_width, source_height = self.source_size
+        target_width, target_height = decode_size
+        for decode_flag, scale in ((cv2.IMREAD_REDUCED_COLOR_4, 4), (cv2.IMREAD_REDUCED_COLOR_2, 2)):
+            if source_width >= target_width * scale and source_height >= target_height * scale:
+                return decode_flag, scale
+        return cv2.IMREAD_COLOR, 1
+
+    def set_decode_size(self, size):
+        if size is not None and (size[0] <= 0 or size[1] <= 0):
+            size = None
+        self.decode_size = size
+
+    def get_source_frame_size(self):
+        return self.source_size
+
+    def get_throughput_stats(self):
+        return self.received_bytes, self.decode_seconds
+
+    def get_frame_stats(self):
+        with self.frame_condition:
+            return self.received_frames, self.decoded_frames, self.dropped_frames
 
     def process_text(self, text_data):
-        self.text_callback(text_data.decode())
+        self.text_callback(decode_payload(Network.MT_TEXT, text_data))
         
     def process_command(self, cmd):
-        self.command_callback(int.from_bytes(cmd, byteorder='big'))
+        self.command_callback(decode_payload(Network.MT_COMMANDS, cmd))
 
     def is_connected(self):
         return self.connected
 
     def send_state_change_request_to_server(self, state):
-        if self.is_connected():
-            msg_type = Network.MT_STATE_CHANGE_REQ
-            msg_data = struct.pack('>I', state)
-            self.send_message(msg_type, msg_data)
-            return True
-        return False
+        return self.send_message(Network.MT_STATE_CHANGE_REQ, state)
 
     def send_prearm_code_to_server(self, code):
-        if self.is_connected():
-            msg_type = Network.MT_PREARM
-            msg_data = code.encode() + b'\0'
-            self.send_message(msg_type, msg_data)
-            return True
-        return False
+        return self.send_message(Network.MT_PREARM, code)
 
     def send_command_to_server(self, code):
-        if self.is_connected():
-            msg_type = Network.MT_COMMANDS
-            msg_data = struct.pack('B', code)
-            self.send_message(msg_type, msg_data)
+        if not self.is_connected():
+            return False
+        if self.is_pending_start(code):
+            return True
+        if self.send_message(Network.MT_COMMANDS, code):
             return True
+        with self.send_condition:
+            # A refused START must not swallow the next repeat
+            self.pending_starts.discard(code)
         return False
 
+    def is_pending_start(self, code):
+        # The server moves one step per START, so auto-repeat is only collapsed while
+        # an identical START is still waiting to be written and no STOP followed it
+        with self.send_condition:
+            if code in Setting.PAN_FIRE_START_LIST:
+                if code in self.pending_starts:
+                    return True
+                self.pending_starts.add(code)
+            elif code in Setting.PAN_FIRE_STOP_LIST:
+                self.pending_starts.discard(~code & 0xFF)
+            return False
+
     def send_calib_to_server(self, code):
-        if self.is_connected():
-            msg_type = Network.MT_CALIB_COMMANDS
-            msg_data = struct.pack('B', code)
-            self.send_message(msg_type, msg_data)
-            return True
-        return False
+        return self.send_message(Network.MT_CALIB_COMMANDS, code)
 
     def send_target_order_to_server(self, target_order):
-        if self.is_connected():
-            msg_type = Network.MT_TARGET_SEQUENCE
-            msg_data = target_order.encode() + b'\0'
-            self.send_message(msg_type, msg_data)
-            return True
-        return False
+        return self.send_message(Network.MT_TARGET_SEQUENCE, target_order)
     
     def send_config_to_server(self, type, value):
-        if self.is_connected():
-            msg_type = Network.MT_CONFIG
-            strValue = f"{type}:{value}"
-            msg_data = strValue.encode('ascii') + b'\0'
-            self.send_message(msg_type, msg_data)
-            return True
-        return False
\ No newline at end of file
+        return self.send_message(Network.MT_CONFIG, f"{type}:{value}")
\ No newline at end of file
@@ -0,0 +1,75 @@
+import os
+import cv2
+import numpy as np
+from PyQt5 import QtCore
+from constant.DisplayConstant import PLAYER_THUMBNAIL_COUNT, PLAYER_THUMBNAIL_HEIGHT
+
+# Thumbnails of a recording are cached as <video>.thumbs.npz, keyed by the video size and mtime
+THUMBNAIL_CACHE_SUFFIX = ".thumbs.npz"
+THUMBNAIL_CACHE_VERSION = 1
+
+def get_thumbnail_indices(frame_count, count=PLAYER_THUMBNAIL_COUNT):
+    if frame_count <= 0:
+        return []
+    count = min(count, frame_count)
+    # Centre of each equal share of the recording
+    return [int((slot + 0.5) * frame_count / count) for slot in range(count)]
+
+def get_source_key(path):
+    stat = os.stat(path)
+    return np.array([THUMBNAIL_CACHE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+def load_thumbnails(path, frameIndices):
+    cache_path = path + THUMBNAIL_CACHE_SUFFIX
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path) as cache:
+            if not np.array_equal(cache["source"], get_source_key(path)) or \
+               not np.array_equal(cache["indices"], np.array(frameIndices, dtype=np.int64)):
+                return None
+            return list(cache["thumbnails"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_thumbnails(path, frameIndices, thumbnails):
+    try:
+        with open(path + THUMBNAIL_CACHE_SUFFIX, "wb") as file:
+            np.savez_compressed(file, source=get_source_key(path), indices=np.array(frameIndices, dtype=np.int64),
+                                thumbnails=np.stack(thumbnails))
+    except OSError as e:
+        print(f"Could not cache the thumbnails of {path}: {e}")
+
+class ThumbnailBuilder(QtCore.QThread):
+    # Decodes one reduced frame per thumbnail, each is handed to the GUI as soon as it is ready.
+    # The path travels with it so thumbnails still queued from a previous file can be told apart.
+    thumbnailReady = QtCore.pyqtSignal(str, int, object)
+
+    def __init__(self, source, path, frameIndices, height=PLAYER_THUMBNAIL_HEIGHT):
+        super().__init__()
+        self.source = source
+        self.path = path
+        self.frame_indices = frameIndices
+        self.height = height
+        self.running = True
+
+    def run(self):
+        thumbnails = []
+        width = None
+        for slot, index in enumerate(self.frame_indices):
+            if not self.running:
+                return
+            frame = self.source.read(index, reduced=True)
+            if frame is None:
+                return
+            # Every thumbnail takes the size of the first, so segments of another resolution still stack into the cache
+            if width is None:
+                width = max(1, int(round(frame.shape[1] * self.height / frame.shape[0])))
+            thumbnail = cv2.resize(frame, (width, self.height), interpolation=cv2.INTER_AREA)
+            thumbnails.append(thumbnail)
+            self.thumbnailReady.emit(self.path, slot, thumbnail)
+        save_thumbnails(self.path, self.frame_indices, thumbnails)
+
+    def stop(self):
+        self.running = False
+        self.wait()
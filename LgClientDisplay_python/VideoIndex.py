@@ -0,0 +1,234 @@
+import os
+import struct
+import threading
+import cv2
+import numpy as np
+from constant.DisplayConstant import RECORD_RAW_STREAM_EXTENSION
+from MjpegWriter import AVI_HEADER_CHUNK, STREAM_RECORD_HEADER, STREAM_INDEX_ENTRY, STREAM_INDEX_SUFFIX, read_timestamps, get_jpeg_size
+
+# Per-frame byte offsets of JPEG frames, so any frame of an MJPEG recording is one seek and one read away.
+# The index of an AVI is built from its idx1 chunk, or by walking the movi list when idx1 is missing, and
+# cached next to the file so multi-hour recordings only pay for the scan once.
+
+VIDEO_INDEX_SUFFIX = ".vindex.npz"
+VIDEO_INDEX_VERSION = 1
+AVI_IDX1_ENTRY = np.dtype([("id", "S4"), ("flags", "<u4"), ("offset", "<u4"), ("size", "<u4")])
+AVI_VIDEO_CHUNK_IDS = (b'00dc', b'00db')
+AVI_DEFAULT_FPS = 30.0
+
+class FrameIndex:
+    def __init__(self, offsets, lengths, frame_times):
+        self.offsets = offsets
+        self.lengths = lengths
+        self.frame_times = frame_times
+
+    def __len__(self):
+        return len(self.offsets)
+
+def get_nominal_times(count, fps):
+    return np.arange(count, dtype=np.float64) / fps
+
+def get_video_duration(frame_times):
+    # The last frame is shown for one average frame interval
+    count = len(frame_times)
+    if count == 0:
+        return 0.0
+    if count == 1:
+        return 1 / AVI_DEFAULT_FPS
+    return float(frame_times[-1]) * count / (count - 1)
+
+def load_stream_index(path):
+    with open(path + STREAM_INDEX_SUFFIX, "rb") as file:
+        data = file.read()
+    data = data[:len(data) - len(data) % STREAM_INDEX_ENTRY.size]
+    entries = np.frombuffer(data, dtype=np.dtype([("time", ">u8"), ("offset", ">u8"), ("size", ">u4")]))
+    return FrameIndex(entries["offset"].astype(np.int64) + STREAM_RECORD_HEADER.size, entries["size"].astype(np.int64),
+                      entries["time"].astype(np.float64) / 1e9)
+
+def read_avi_layout(file):
+    # Returns (microseconds per frame, movi fourcc offset, movi end, idx1 payload or None) of the first RIFF
+    header = file.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'AVI ':
+        return None
+    riff_end = 8 + struct.unpack('<I', header[4:8])[0]
+    file_size = os.fstat(file.fileno()).st_size
+    microseconds_per_frame = 0
+    movi_offset = movi_end = None
+    idx1 = None
+    position = 12
+    while position + 8 <= min(riff_end, file_size):
+        file.seek(position)
+        fourcc, size = AVI_HEADER_CHUNK.unpack(file.read(8))
+        if fourcc == b'LIST':
+            list_type = file.read(4)
+            if list_type == b'hdrl':
+                hdrl = file.read(min(size - 4, 4096))
+                avih = hdrl.find(b'avih')
+                if avih >= 0 and avih + 12 <= len(hdrl):
+                    microseconds_per_frame = struct.unpack('<I', hdrl[avih + 8:avih + 12])[0]
+            elif list_type == b'movi':
+                movi_offset = position + 8
+                movi_end = min(position + 8 + size, file_size)
+        elif fourcc == b'idx1':
+            idx1 = file.read(size)
+        position += 8 + size + (size & 1)
+    if movi_offset is None:
+        return None
+    return microseconds_per_frame, movi_offset, movi_end, idx1
+
+def scan_movi(file, movi_offset, movi_end):
+    # Fallback for files without idx1, one header read per chunk
+    offsets = []
+    lengths = []
+    position = movi_offset + 4
+    while position + 8 <= movi_end:
+        file.seek(position)
+        fourcc, size = AVI_HEADER_CHUNK.unpack(file.read(8))
+        if fourcc == b'LIST':
+            # rec lists only group chunks, step into them
+            position += 12
+            continue
+        if fourcc in AVI_VIDEO_CHUNK_IDS and size > 0:
+            offsets.append(position + 8)
+            lengths.append(size)
+        position += 8 + size + (size & 1)
+    return np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+def build_avi_index(path):
+    with open(path, "rb") as file:
+        layout = read_avi_layout(file)
+        if layout is None:
+            return None
+        microseconds_per_frame, movi_offset, movi_end, idx1 = layout
+        if idx1:
+            entries = np.frombuffer(idx1[:len(idx1) - len(idx1) % AVI_IDX1_ENTRY.itemsize], dtype=AVI_IDX1_ENTRY)
+            entries = entries[np.isin(entries["id"], AVI_VIDEO_CHUNK_IDS) & (entries["size"] > 0)]
+            offsets = entries["offset"].astype(np.int64)
+            # idx1 offsets are relative to the movi fourcc in most writers and absolute in a few
+            if len(offsets) and offsets[0] < movi_offset:
+                offsets += movi_offset
+            offsets += 8
+            lengths = entries["size"].astype(np.int64)
+        else:
+            offsets, lengths = scan_movi(file, movi_offset, movi_end)
+        if len(offsets) == 0:
+            return None
+        # Only JPEG payloads can be read directly, anything else goes through VideoCapture
+        file.seek(int(offsets[0]))
+        if file.read(2) != b'\xff\xd8':
+            return None
+    fps = 1000000 / microseconds_per_frame if microseconds_per_frame else AVI_DEFAULT_FPS
+    frame_times = read_timestamps(path)
+    if frame_times is not None and len(frame_times) == len(offsets):
+        frame_times = np.array(frame_times, dtype=np.float64)
+    else:
+        frame_times = get_nominal_times(len(offsets), fps)
+    return FrameIndex(offsets, lengths, frame_times)
+
+def load_cached_index(path):
+    cache_path = path + VIDEO_INDEX_SUFFIX
+    if not os.path.exists(cache_path):
+        return None
+    stat = os.stat(path)
+    try:
+        with np.load(cache_path) as cache:
+            source = cache["source"]
+            if int(source[0]) != VIDEO_INDEX_VERSION or int(source[1]) != stat.st_size or int(source[2]) != stat.st_mtime_ns:
+                return None
+            return FrameIndex(cache["offsets"], cache["lengths"], cache["frame_times"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_cached_index(path, frame_index):
+    stat = os.stat(path)
+    try:
+        with open(path + VIDEO_INDEX_SUFFIX, "wb") as file:
+            np.savez(file, source=np.array([VIDEO_INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64),
+                     offsets=frame_index.offsets, lengths=frame_index.lengths, frame_times=frame_index.frame_times)
+    except OSError as e:
+        # A read-only location only costs a rebuild next time
+        print(f"Could not cache the frame index of {path}: {e}")
+
+def load_frame_index(path):
+    if os.path.splitext(path)[1].lower() == RECORD_RAW_STREAM_EXTENSION:
+        if os.path.exists(path + STREAM_INDEX_SUFFIX):
+            return load_stream_index(path)
+        return None
+    frame_index = load_cached_index(path)
+    if frame_index is None:
+        frame_index = build_avi_index(path)
+        if frame_index is not None:
+            save_cached_index(path, frame_index)
+    return frame_index
+
+class IndexedVideoSource:
+    # Random access to MJPEG frames by index, reads are serialized so the player and a decoder thread can share it
+    def __init__(self, path, frameIndex):
+        self.file = open(path, "rb")
+        self.frame_index = frameIndex
+        self.frame_times = frameIndex.frame_times
+        self.frame_count = len(frameIndex)
+        self.read_lock = threading.Lock()
+
+    def read_jpeg(self, index):
+        with self.read_lock:
+            self.file.seek(int(self.frame_index.offsets[index]))
+            return self.file.read(int(self.frame_index.lengths[index]))
+
+    def read(self, index, reduced=False):
+        # Reduced reads let libjpeg skip most of the IDCT work, for scrubbing previews
+        if index < 0 or index >= self.frame_count:
+            return None
+        data = self.read_jpeg(index)
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_COLOR_4 if reduced else cv2.IMREAD_COLOR)
+
+    def get_frame_size(self):
+        return get_jpeg_size(self.read_jpeg(0)) if self.frame_count > 0 else None
+
+    def release(self):
+        with self.read_lock:
+            self.file.close()
+
+class CaptureVideoSource:
+    # Containers that cannot be indexed, seeking is left to the backend and only done when reads are not sequential
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or AVI_DEFAULT_FPS
+        frame_times = read_timestamps(path)
+        if frame_times:
+            self.frame_count = min(self.frame_count, len(frame_times)) if self.frame_count > 0 else len(frame_times)
+            self.frame_times = np.array(frame_times[:self.frame_count], dtype=np.float64)
+        else:
+            self.frame_times = get_nominal_times(self.frame_count, fps)
+        self.position = 0
+        self.read_lock = threading.Lock()
+
+    def read(self, index, reduced=False):
+        if index < 0 or index >= self.frame_count:
+            return None
+        with self.read_lock:
+            if index != self.position:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = self.cap.read()
+            self.position = index + 1 if ret else -1
+        return frame if ret else None
+
+    def get_frame_size(self):
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        return (width, height) if width > 0 and height > 0 else None
+
+    def release(self):
+        with self.read_lock:
+            self.cap.release()
+
+def open_video_source(path):
+    frame_index = load_frame_index(path)
+    if frame_index is not None:
+        return IndexedVideoSource(path, frame_index)
+    source = CaptureVideoSource(path)
+    if not source.cap.isOpened():
+        source.release()
+        return None
+    return source
@@ -1,14 +1,24 @@
 import sys
 import os
+import time
 import cv2
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QHBoxLayout, QFileDialog, 
-                             QProgressBar, QDialog, QSizePolicy)
+                             QDialog, QSizePolicy, QComboBox)
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5 import QtCore, QtGui
 
-from constant.DisplayConstant import DIALOG_VIDEO_FILE_LOCATION, FONT_FAMILY
+from constant.DisplayConstant import DIALOG_VIDEO_FILE_LOCATION, FONT_FAMILY, PLAYER_IDLE_POLL_MS, PLAYER_SPEED_LIST, \
+                                    PLAYER_DEFAULT_SPEED, PLAYER_THUMBNAIL_HEIGHT, PLAYER_EVENT_COLOR_HIT, PLAYER_EVENT_COLOR_MISS, \
+                                    PLAYER_EVENT_COLOR_STATE
 from constant.StyleSheet import LABEL_CAMERA_STYLE, VIDEO_PLAYER_PROGRESS_STYLE
+from display.SeekBar import SeekBar
+from display.ThumbnailStrip import ThumbnailStrip
+from display.RecordingLibraryDialog import RecordingLibraryDialog
+from VideoIndex import open_video_source, get_video_duration
+from PlaybackDecoder import PlaybackClock, PlaybackDecoder, FrameCache, decode_image
+from ThumbnailBuilder import ThumbnailBuilder, get_thumbnail_indices, load_thumbnails
+from EventTrack import EVENT_TYPE_HIT, EVENT_TYPE_MISS, read_events
 
 class VideoPlayer(QDialog):
     def __init__(self, closeCallback):
@@ -27,11 +37,21 @@ class VideoPlayer(QDialog):
         self.play_pause_button = QPushButton("Play", self)
         self.stop_button = QPushButton("Stop", self)
         self.right_button = QPushButton("5s >>", self)
+        self.step_back_button = QPushButton("< 1f", self)
+        self.step_forward_button = QPushButton("1f >", self)
+        self.reverse_button = QPushButton("Reverse", self)
+        self.reverse_button.setCheckable(True)
+        self.speed_combo = QComboBox(self)
+        for speed in PLAYER_SPEED_LIST:
+            self.speed_combo.addItem(f"{speed:g}x", speed)
+        self.speed_combo.setCurrentIndex(PLAYER_SPEED_LIST.index(PLAYER_DEFAULT_SPEED))
         
-        self.progress_bar = QProgressBar(self)
+        self.progress_bar = SeekBar(self)
         self.progress_bar.setStyleSheet(VIDEO_PLAYER_PROGRESS_STYLE)
         self.progress_bar.setFixedHeight(25)
         self.time_label = QLabel("00:00:00 / 00:00:00", self)
+        self.thumbnail_strip = ThumbnailStrip(self)
+        self.thumbnail_strip.setFixedHeight(PLAYER_THUMBNAIL_HEIGHT)
         
         self.init_ui()
         
@@ -40,23 +60,51 @@ class VideoPlayer(QDialog):
         self.play_pause_button.clicked.connect(self.toggle_play_pause)
         self.stop_button.clicked.connect(self.stop_playback)
         self.right_button.clicked.connect(lambda: self.seek_video(5))
+        self.step_back_button.clicked.connect(lambda: self.step_frame(-1))
+        self.step_forward_button.clicked.connect(lambda: self.step_frame(1))
+        self.reverse_button.toggled.connect(self.update_playback_rate)
+        self.speed_combo.currentIndexChanged.connect(self.update_playback_rate)
+        self.progress_bar.scrubStarted.connect(self.start_scrub)
+        self.progress_bar.scrubMoved.connect(self.scrub_video)
+        self.progress_bar.scrubFinished.connect(self.finish_scrub)
+        self.thumbnail_strip.thumbnailClicked.connect(self.seek_frame)
         
         self.video_file = DIALOG_VIDEO_FILE_LOCATION
-        self.cap = None
+        self.source = None
+        # Decoding runs on self.decoder while playing, the timer only presents frames as the clock reaches them
+        self.decoder = None
+        self.clock = PlaybackClock()
+        # Display-ready frames shared by playback, frame steps and seeks, so going back does not re-decode
+        self.frame_cache = FrameCache()
         self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
         self.timer.timeout.connect(self.next_frame)
         self.playing = False
-        self.frame_rate = 30
+        # Index of the frame on screen
         self.current_frame = 0
         self.total_frames = 0
+        # Presentation time in seconds of every frame, from the recorded capture times when available
+        self.frame_times = np.zeros(0)
+        self.resume_after_scrub = False
+        self.frame_size = None
+        self.thumbnail_builder = None
+        self.events = []
+        self.library_dialog = None
+        # Set by the controller, returns the recordings still being written
+        self.open_recordings_callback = None
         
     def init_ui(self):
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.find_button)
         button_layout.addWidget(self.left_button)
+        button_layout.addWidget(self.step_back_button)
         button_layout.addWidget(self.play_pause_button)
         button_layout.addWidget(self.stop_button)
+        button_layout.addWidget(self.step_forward_button)
         button_layout.addWidget(self.right_button)
+        button_layout.addWidget(self.reverse_button)
+        button_layout.addWidget(self.speed_combo)
 
         self.progress_bar.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.time_label.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Expanding)
@@ -74,32 +122,101 @@ class VideoPlayer(QDialog):
         
         main_layout = QVBoxLayout()
         main_layout.addWidget(self.label_camera_video)
+        main_layout.addWidget(self.thumbnail_strip)
         main_layout.addLayout(progress_layout)
         main_layout.addLayout(button_layout)
         main_layout.setStretch(0, 1)
         main_layout.setStretch(1, 0)
         main_layout.setStretch(2, 0)
+        main_layout.setStretch(3, 0)
         
         self.setLayout(main_layout)
         
     def open_file(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Open Video File", "", "Video Files (*.avi *.mp4 *.mkv)")
+        # Recordings are picked from the catalog, files elsewhere through its browse button
+        if self.library_dialog is None:
+            self.library_dialog = RecordingLibraryDialog(os.path.join(os.getcwd(), DIALOG_VIDEO_FILE_LOCATION), self,
+                                                         self.open_recordings_callback)
+        if self.library_dialog.exec_() == QDialog.Accepted and self.library_dialog.selected_file:
+            self.load_video(self.library_dialog.selected_file)
+
+    def load_video(self, file_name):
         if file_name:
+            self.pause_video()
+            self.stop_thumbnail_builder()
+            if self.source is not None:
+                self.source.release()
             self.video_file = file_name
-            self.cap = cv2.VideoCapture(self.video_file)
-            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            self.frame_rate = int(self.cap.get(cv2.CAP_PROP_FPS))
+            self.frame_cache = FrameCache()
+            self.source = open_video_source(self.video_file)
+            if self.source is None:
+                self.total_frames = 0
+                self.frame_times = np.zeros(0)
+                self.update_progress_bar()
+                self.load_events()
+                self.load_thumbnails()
+                return
+            self.total_frames = self.source.frame_count
+            self.frame_times = self.source.frame_times
             self.update_progress_bar()
+            self.load_events()
+            self.load_thumbnails()
             self.stop_playback()
             self.play_pause_button.setText("Play")
 
+    def load_events(self):
+        # Hit, miss and state markers from the recorder's event track, placed on the frame showing at their time
+        self.events = read_events(self.video_file) if self.source is not None else []
+        colors = {EVENT_TYPE_HIT: PLAYER_EVENT_COLOR_HIT, EVENT_TYPE_MISS: PLAYER_EVENT_COLOR_MISS}
+        markers = []
+        for event in self.events:
+            index = max(0, int(np.searchsorted(self.frame_times, event["time"], side="right")) - 1)
+            color = colors.get(event["type"], PLAYER_EVENT_COLOR_STATE)
+            markers.append((min(index, max(0, self.total_frames - 1)), color,
+                            f"{self.format_time(event['time'])} {event.get('text', event['type'])}"))
+        self.progress_bar.set_markers(markers)
+
+    def load_thumbnails(self):
+        frame_indices = get_thumbnail_indices(self.total_frames)
+        self.thumbnail_strip.set_frames(frame_indices)
+        if not frame_indices:
+            return
+        thumbnails = load_thumbnails(self.video_file, frame_indices)
+        if thumbnails is not None:
+            for slot, thumbnail in enumerate(thumbnails):
+                self.set_thumbnail(self.video_file, slot, thumbnail)
+            return
+        self.thumbnail_builder = ThumbnailBuilder(self.source, self.video_file, frame_indices)
+        self.thumbnail_builder.thumbnailReady.connect(self.set_thumbnail)
+        self.thumbnail_builder.start(QtCore.QThread.LowPriority)
+
+    def set_thumbnail(self, path, slot, thumbnail):
+        if path != self.video_file:
+            return
+        image = QImage(thumbnail.data, thumbnail.shape[1], thumbnail.shape[0], thumbnail.strides[0], QImage.Format_BGR888)
+        self.thumbnail_strip.set_thumbnail(slot, QPixmap.fromImage(image))
+
+    def stop_thumbnail_builder(self):
+        if self.thumbnail_builder is not None:
+            self.thumbnail_builder.stop()
+            self.thumbnail_builder = None
+
+    def get_duration(self):
+        return get_video_duration(self.frame_times)
+
+    def get_position(self):
+        if self.current_frame < self.total_frames:
+            return float(self.frame_times[self.current_frame])
+        return 0.0
+
+    def get_frame_at(self, seconds):
+        return max(0, min(self.total_frames - 1, int(np.searchsorted(self.frame_times, seconds))))
+
     def update_progress_bar(self):
-        self.progress_bar.setMaximum(self.total_frames)
-        self.progress_bar.setValue(self.current_frame)
+        self.progress_bar.setMaximum(max(0, self.total_frames - 1))
+        self.progress_bar.setValue(min(self.current_frame, max(0, self.total_frames - 1)))
         self.progress_bar.setAlignment(QtCore.Qt.AlignCenter)
-        total_duration = self.total_frames / self.frame_rate
-        current_duration = self.current_frame / self.frame_rate
-        self.time_label.setText(f"{self.format_time(current_duration)} / {self.format_time(total_duration)}")
+        self.time_label.setText(f"{self.format_time(self.get_position())} / {self.format_time(self.get_duration())}")
         self.time_label.setAlignment(QtCore.Qt.AlignCenter)
 
     def format_time(self, seconds):
@@ -109,11 +226,53 @@ class VideoPlayer(QDialog):
         return f"{h:02}:{m:02}:{s:02}"
 
     def seek_video(self, seconds):
-        if self.cap:
-            self.current_frame = max(0, min(self.total_frames, self.current_frame + int(seconds * self.frame_rate)))
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+        if self.source:
+            self.seek_frame(self.get_frame_at(self.get_position() + seconds))
+
+    def seek_frame(self, index):
+        self.current_frame = index
+        self.update_progress_bar()
+        self.show_frame()
+        if self.playing:
+            self.clock.start(self.get_position())
+            self.decoder.seek(index + self.clock.get_direction())
+            self.timer.start(0)
+
+    def step_frame(self, step):
+        if self.source:
+            self.pause_video()
+            self.seek_frame(max(0, min(self.total_frames - 1, self.current_frame + step)))
+
+    def get_playback_rate(self):
+        speed = self.speed_combo.currentData()
+        return -speed if self.reverse_button.isChecked() else speed
+
+    def update_playback_rate(self):
+        # Re-anchored at the frame on screen, frames buffered for the old rate are spaced wrongly and discarded
+        self.clock.start(self.get_position(), self.get_playback_rate())
+        if self.playing:
+            self.decoder.seek(self.current_frame + self.clock.get_direction())
+            self.timer.start(0)
+
+    def start_scrub(self):
+        if self.source:
+            self.resume_after_scrub = self.playing
+            self.pause_video()
+
+    def scrub_video(self, index):
+        # Previews decode at a quarter resolution and are scaled up, so dragging keeps up with the mouse
+        if self.source and index != self.current_frame:
+            self.current_frame = index
             self.update_progress_bar()
-            self.show_frame()
+            frame = self.source.read(index, reduced=True)
+            if frame is not None:
+                self.display_frame(frame, self.frame_size)
+
+    def finish_scrub(self, index):
+        if self.source:
+            self.seek_frame(index)
+            if self.resume_after_scrub:
+                self.play_video()
 
     def toggle_play_pause(self):
         if self.playing:
@@ -122,50 +281,74 @@ class VideoPlayer(QDialog):
             self.play_video()
 
     def play_video(self):
-        if self.cap:
+        if self.source:
+            rate = self.get_playback_rate()
+            # Playing from the last frame forward, or the first frame in reverse, starts over from the other end
+            end_frame = self.total_frames - 1 if rate > 0 else 0
+            if self.current_frame == end_frame:
+                self.current_frame = self.total_frames - 1 - end_frame
+                self.show_frame()
             self.playing = True
-            self.timer.start(1000 // self.frame_rate)
+            # Playback time is anchored to the wall clock, so decode and paint jitter does not accumulate
+            self.clock.start(self.get_position(), rate)
+            self.decoder = PlaybackDecoder(self.source, self.clock, self.current_frame + self.clock.get_direction(),
+                                           self.frame_cache)
+            self.decoder.start()
+            self.timer.start(0)
             self.play_pause_button.setText("Pause")
 
     def pause_video(self):
         if self.playing:
             self.playing = False
             self.timer.stop()
+            self.decoder.stop()
+            self.decoder = None
             self.play_pause_button.setText("Play")
 
     def stop_playback(self):
-        if self.cap:
-            self.playing = False
-            self.timer.stop()
+        if self.source:
+            self.pause_video()
             self.current_frame = 0
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
             self.update_progress_bar()
             self.show_frame()
-            self.play_pause_button.setText("Play")
 
     def next_frame(self):
-        if self.cap and self.playing:
-            ret, frame = self.cap.read()
-            if ret:
-                self.current_frame += 1
-                self.update_progress_bar()
-                self.display_frame(frame)
-            else:
-                self.stop_playback()
+        if not self.playing:
+            return
+        position = self.clock.get_position()
+        # Frames overtaken by the clock are dropped here, so the picture never lags behind the time shown
+        entry, next_time = self.decoder.take_due_frame(position)
+        if entry is not None:
+            self.current_frame = entry[0]
+            self.label_camera_video.setPixmap(QPixmap.fromImage(entry[2]))
+            self.update_progress_bar()
+        if next_time is not None:
+            self.timer.start(max(0, int((next_time - position) / self.clock.rate * 1000)))
+        elif self.decoder.is_finished():
+            self.pause_video()
+        else:
+            self.timer.start(PLAYER_IDLE_POLL_MS)
 
-    def display_frame(self, frame):
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image = QImage(frame_rgb.data, frame_rgb.shape[1], frame_rgb.shape[0], frame_rgb.strides[0], QImage.Format_RGB888)
+    def display_frame(self, frame, size=None):
+        image = QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_BGR888)
         pixmap = QPixmap.fromImage(image)
+        if size is not None and (frame.shape[1], frame.shape[0]) != size:
+            # Reduced scrub previews are shown at the size of the full frames
+            pixmap = pixmap.scaled(size[0], size[1])
+        else:
+            self.frame_size = (frame.shape[1], frame.shape[0])
         self.label_camera_video.setPixmap(pixmap)
 
     def show_frame(self):
-        if self.cap:
-            ret, frame = self.cap.read()
-            if ret:
-                self.display_frame(frame)
+        if self.source:
+            image = decode_image(self.source, self.current_frame, self.frame_cache)
+            if image is not None:
+                self.frame_size = (image.width(), image.height())
+                self.label_camera_video.setPixmap(QPixmap.fromImage(image))
     
     def closeEvent(self, event):
         event.accept()
+        self.pause_video()
+        self.stop_thumbnail_builder()
         self.closeCallbackFunc()
         
\ No newline at end of file
@@ -1,62 +1,499 @@
 import os
+import time
+import sqlite3
 from PyQt5 import QtCore
-import queue
+import threading
+from collections import deque
 import cv2
+import numpy as np
 from datetime import datetime
-from constant.DisplayConstant import DIALOG_VIDEO_FILE_LOCATION
+from constant.DisplayConstant import DIALOG_VIDEO_FILE_LOCATION, RECORD_QUEUE_SIZE, RECORD_QUEUE_POLICY, RECORD_POLICY_DROP_OLDEST, \
+                                    RECORD_POLICY_DROP_NEWEST, RECORD_POLICY_BLOCK, RECORD_BLOCK_TIMEOUT_SEC, RECORD_MODE, RECORD_MODE_REENCODE, \
+                                    RECORD_MODE_RAW_STREAM, RECORD_FPS, RECORD_RAW_STREAM_EXTENSION, PRE_EVENT_BUFFER_SEC, PRE_EVENT_BUFFER_MAX_MB, \
+                                    RECORD_FILE_PREFIX, REPLAY_FILE_PREFIX
+from FrameMetrics import FRAME_MARK_RECORD_ENQUEUE, FRAME_MARK_RECORD_WRITTEN
+from MjpegWriter import MjpegAviWriter, MjpegStreamWriter, TimestampWriter, TIMESTAMP_SUFFIX, STREAM_INDEX_SUFFIX
+from EventTrack import EventTrackWriter, EVENT_TYPE_INFO, EVENT_TRACK_SUFFIX
+from RecordingCatalog import RecordingCatalog
+from VideoIndex import VIDEO_INDEX_SUFFIX
+from ThumbnailBuilder import THUMBNAIL_CACHE_SUFFIX
 
 class VideoRecorder(QtCore.QThread):
-    def __init__(self, updateFileNameCallback):
+    def __init__(self, updateFileNameCallback, queueSize=RECORD_QUEUE_SIZE, queuePolicy=RECORD_QUEUE_POLICY, recordMode=RECORD_MODE,
+                 preEventSeconds=PRE_EVENT_BUFFER_SEC, preEventMaxBytes=PRE_EVENT_BUFFER_MAX_MB * 1024 * 1024):
         super().__init__()
         self.recording = False
         self.video_writer = None
+        self.timestamp_writer = None
+        self.event_writer = None
+        # Target order and algorithm, written at the start of every recording, segment and replay
+        self.session_info = None
         self.file_name = ""
+        self.file_prefix = RECORD_FILE_PREFIX
+        # Capture times of the first and last frame written to the current file
+        self.file_first_timestamp = None
+        self.file_last_timestamp = None
         self.update_file_name = updateFileNameCallback
-        self.event_queue_record = queue.Queue()
-        
+        self.record_mode = recordMode
+        # Frames and control events share one FIFO, only frame entries count against queue_size
+        self.event_condition = threading.Condition()
+        self.event_queue_record = deque()
+        self.queue_size = queueSize
+        self.queue_policy = queuePolicy
+        self.queued_frames = 0
+        # Writer-sized slots allocated once per recording, a frame is copied into a free slot on enqueue
+        self.free_slots = []
+        self.slot_shape = None
+        self.enqueued_frames = 0
+        self.written_frames = 0
+        self.dropped_frames = 0
+        # (jpeg bytes, timestamp ns) received while not recording, bounded by age and total size
+        self.pre_event_lock = threading.Lock()
+        self.pre_event_frames = deque()
+        self.pre_event_bytes = 0
+        self.pre_event_seconds = preEventSeconds
+        self.pre_event_max_bytes = preEventMaxBytes
+
         self.directory = os.path.join(os.getcwd(), DIALOG_VIDEO_FILE_LOCATION)
         self.ensure_directory_exists(self.directory)
         self.fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-        
+        self.frame_size = (0, 0)
+        # Re-encode recordings started before any frame was decoded open their writer at the first frame's size
+        self.writer_pending = False
+
     def run(self):
         while True:
-            event = self.event_queue_record.get()
+            with self.event_condition:
+                while not self.event_queue_record:
+                    self.event_condition.wait()
+                event = self.event_queue_record.popleft()
+                if self.is_frame_event(event):
+                    self.queued_frames -= 1
             if event is None:
                 break
             func, args = event
             func(*args)
-            self.event_queue_record.task_done()
-    
-    def set_recording(self, record, frame_size):
-        self.recording = record
-        if record and self.video_writer is None:
-            current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.video_file = os.path.join(self.directory, f"video_{current_time}.avi")
-            self.file_name = f"video_{current_time}.avi"
-            self.video_writer = cv2.VideoWriter(self.video_file, self.fourcc, 35.0, frame_size)
-    
+
+    def set_recording(self, record, frame_size, prefix=RECORD_FILE_PREFIX):
+        if not record:
+            self.recording = False
+            return
+        if self.recording:
+            return
+        with self.pre_event_lock, self.event_condition:
+            # The writer is opened on the writer thread, after a stop that may still be queued closed the previous one.
+            # Queued before the flag flips, so buffered frames land ahead of the first live frame.
+            if not self.is_passthrough():
+                if self.is_known_size(frame_size):
+                    self.allocate_slots(frame_size)
+                else:
+                    # The first enqueued frame sizes the slot pool instead
+                    self.slot_shape = None
+                    self.free_slots = []
+            self.put_event((self.start_writer, [prefix, frame_size]))
+            frames = self.take_pre_event_frames()
+            if frames:
+                self.put_event((self.write_pre_event_frames, [frames]))
+            if self.session_info is not None:
+                self.put_event((self.write_event, [time.monotonic_ns(), EVENT_TYPE_INFO, self.session_info]))
+            self.recording = True
+
+    def start_writer(self, prefix, frame_size):
+        if self.video_writer is not None:
+            # Started again without a stop in between, the open file is kept as it is
+            self.finish_files(self.close_writer())
+        self.file_prefix = prefix
+        if not self.is_passthrough() and not self.is_known_size(frame_size):
+            self.writer_pending = True
+            return
+        self.frame_size = frame_size
+        self.open_writer()
+
+    def open_pending_writer(self, frame_size):
+        # Writer thread, opens a writer deferred by start_writer at the size of the first frame to record
+        if self.video_writer is not None or not self.writer_pending:
+            return
+        self.writer_pending = False
+        self.frame_size = frame_size
+        self.allocate_slots(frame_size)
+        self.open_writer()
+
+    def is_known_size(self, frame_size):
+        return frame_size is not None and frame_size[0] > 0 and frame_size[1] > 0
+
+    def open_writer(self):
+        self.file_name = self.get_new_file_name(self.file_prefix)
+        self.video_file = os.path.join(self.directory, self.file_name)
+        self.file_first_timestamp = None
+        self.file_last_timestamp = None
+        if self.is_passthrough():
+            self.video_writer = self.create_jpeg_writer(self.video_file)
+        else:
+            self.video_writer = cv2.VideoWriter(self.video_file, self.fourcc, RECORD_FPS, self.frame_size)
+            # The container rate is nominal, real frame times go to the .ts sidecar
+            self.timestamp_writer = TimestampWriter(self.video_file)
+
+    def get_new_file_name(self, prefix):
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+        extension = RECORD_RAW_STREAM_EXTENSION if self.record_mode == RECORD_MODE_RAW_STREAM else ".avi"
+        file_name = f"{prefix}_{current_time}{extension}"
+        # Clips cut within the same second get a counter instead of overwriting each other
+        count = 1
+        while os.path.exists(os.path.join(self.directory, file_name)):
+            count += 1
+            file_name = f"{prefix}_{current_time}_{count}{extension}"
+        return file_name
+
+    def create_jpeg_writer(self, path):
+        if self.record_mode == RECORD_MODE_RAW_STREAM:
+            return MjpegStreamWriter(path)
+        return MjpegAviWriter(path, RECORD_FPS)
+
+    def is_passthrough(self):
+        return self.record_mode != RECORD_MODE_REENCODE
+
+    def allocate_slots(self, frame_size):
+        shape = (frame_size[1], frame_size[0], 3)
+        with self.event_condition:
+            if shape == self.slot_shape:
+                return
+            # Slots still queued at the old size are discarded by start_recording
+            self.slot_shape = shape
+            # One extra slot for the frame being written while the queue is full
+            self.free_slots = [np.empty(shape, np.uint8) for _ in range(self.queue_size + 1)]
+
     def get_recording(self):
         return self.recording
-    
+
+    def needs_jpeg_frames(self):
+        return self.pre_event_seconds > 0 or (self.recording and self.is_passthrough())
+
+    def set_session_info(self, fields):
+        self.session_info = fields
+        if self.recording:
+            self.enqueue_record_event(EVENT_TYPE_INFO, fields)
+
+    def get_queue_depth(self):
+        with self.event_condition:
+            return self.queued_frames
+
+    def get_record_stats(self):
+        return self.enqueued_frames, self.written_frames, self.dropped_frames
+
+    def get_open_file_names(self):
+        # Called from other threads, the file still being written is left out of the catalog until it is finished
+        writer = self.video_writer
+        if writer is None:
+            return []
+        if self.is_passthrough():
+            # Earlier AVI segments are already closed, only the last one is open
+            return writer.file_names[-1:]
+        return [self.file_name]
+
+    # Pre-event buffer
+    def receive_jpeg(self, data, timestamp_ns, frame_info=None):
+        # Receiver callback, buffers frames while idle and forwards them while recording in a pass-through mode
+        with self.pre_event_lock:
+            live = self.recording
+            if not live and self.pre_event_seconds > 0:
+                self.add_pre_event_frame(data, timestamp_ns)
+        if live and self.is_passthrough():
+            self.enqueue_record_jpeg(data, timestamp_ns, frame_info)
+
+    def add_pre_event_frame(self, data, timestamp_ns):
+        # Called with pre_event_lock held
+        self.pre_event_frames.append((data, timestamp_ns))
+        self.pre_event_bytes += len(data)
+        oldest_ns = timestamp_ns - int(self.pre_event_seconds * 1e9)
+        while self.pre_event_frames and (self.pre_event_bytes > self.pre_event_max_bytes or self.pre_event_frames[0][1] < oldest_ns):
+            self.pre_event_bytes -= len(self.pre_event_frames.popleft()[0])
+
+    def take_pre_event_frames(self):
+        # Called with pre_event_lock held, frames older than the window (e.g. from before a reconnect) are left out
+        oldest_ns = time.monotonic_ns() - int(self.pre_event_seconds * 1e9)
+        frames = [frame for frame in self.pre_event_frames if frame[1] >= oldest_ns]
+        self.pre_event_frames.clear()
+        self.pre_event_bytes = 0
+        return frames
+
+    def get_pre_event_stats(self):
+        with self.pre_event_lock:
+            return len(self.pre_event_frames), self.pre_event_bytes
+
     # Queue Function
-    def enqueue_record_video(self, image):
-        self.event_queue_record.put((self.start_recording, [image]))
+    def enqueue_record_jpeg(self, data, timestamp_ns, frame_info=None):
+        # Pass-through modes, data is the JPEG exactly as received and is never decoded here.
+        # This runs on the socket reader, so the block policy drops the newest frame instead of waiting.
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_RECORD_ENQUEUE)
+        with self.event_condition:
+            # The writer itself is swapped on the writer thread when a clip is cut
+            if not self.recording or not self.reserve_frame(wait=False):
+                return
+        self.put_event((self.write_jpeg, [data, timestamp_ns, frame_info]))
+
+    def enqueue_record_video(self, image, frame_info=None):
+        if frame_info is not None:
+            frame_info.mark(FRAME_MARK_RECORD_ENQUEUE)
+        timestamp_ns = time.monotonic_ns()
+        slot = self.acquire_slot((image.shape[1], image.shape[0]))
+        if slot is None:
+            return
+        slot_size = (slot.shape[1], slot.shape[0])
+        if (image.shape[1], image.shape[0]) != slot_size:
+            # Frames decoded at display size before recording started are scaled to the writer size
+            cv2.resize(image, slot_size, dst=slot)
+        else:
+            np.copyto(slot, image)
+        self.put_event((self.start_recording, [slot, timestamp_ns, frame_info]))
+
+    def acquire_slot(self, image_size):
+        with self.event_condition:
+            if self.slot_shape is None and self.recording and not self.is_passthrough():
+                # Recording started before the frame size was known
+                self.allocate_slots(image_size)
+            if self.slot_shape is None or not self.reserve_frame():
+                return None
+            if not self.free_slots:
+                self.queued_frames -= 1
+                self.dropped_frames += 1
+                return None
+            return self.free_slots.pop()
+
+    def reserve_frame(self, wait=True):
+        # Called with event_condition held, applies the queue policy and counts the frame as queued
+        self.enqueued_frames += 1
+        if self.queued_frames >= self.queue_size:
+            if self.queue_policy == RECORD_POLICY_DROP_OLDEST:
+                self.drop_oldest_frame()
+            elif self.queue_policy == RECORD_POLICY_BLOCK and wait:
+                self.event_condition.wait_for(lambda: self.queued_frames < self.queue_size, RECORD_BLOCK_TIMEOUT_SEC)
+        if self.queued_frames >= self.queue_size:
+            # RECORD_POLICY_DROP_NEWEST, or the block policy timed out
+            self.dropped_frames += 1
+            return False
+        self.queued_frames += 1
+        return True
+
+    def is_frame_event(self, event):
+        return event is not None and (event[0] == self.start_recording or event[0] == self.write_jpeg)
+
+    def drop_oldest_frame(self):
+        for index, event in enumerate(self.event_queue_record):
+            if self.is_frame_event(event):
+                del self.event_queue_record[index]
+                if event[0] == self.start_recording:
+                    self.release_slot(event[1][0])
+                self.queued_frames -= 1
+                self.dropped_frames += 1
+                return
+
+    def release_slot(self, slot):
+        if slot.shape == self.slot_shape:
+            self.free_slots.append(slot)
+            self.event_condition.notify_all()
+
+    def put_event(self, event):
+        with self.event_condition:
+            self.event_queue_record.append(event)
+            self.event_condition.notify_all()
+
+    def enqueue_record_event(self, event_type, fields):
+        # Events share the FIFO with frames so they land between the frames they arrived between
+        if self.recording:
+            self.put_event((self.write_event, [time.monotonic_ns(), event_type, fields]))
+
+    def enqueue_save_replay(self, event_type, fields):
+        # A hit/miss while not recording keeps the buffered lead-up as its own clip
+        timestamp_ns = time.monotonic_ns()
+        with self.pre_event_lock:
+            if self.recording:
+                return
+            frames = self.take_pre_event_frames()
+        if frames:
+            self.put_event((self.save_replay, [frames, timestamp_ns, event_type, fields]))
+
+    def enqueue_cut_clip(self, suffix):
+        # Closes the current file under a name ending in suffix, frames queued after this go to a new file
+        if self.recording:
+            self.put_event((self.cut_clip, [suffix]))
+
+    def enqueue_stop_record_video(self, minSeconds=0):
+        # A last file shorter than minSeconds is deleted instead of kept
+        self.put_event((self.stop_recording, [minSeconds]))
+
+    def enqueue_exit(self):
+        self.put_event(None)
 
-    def enqueue_stop_record_video(self):
-        self.event_queue_record.put((self.stop_recording, []))
-    
     def ensure_directory_exists(self, directory):
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-    def start_recording(self, image):
-        frame = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        if self.video_writer is not None:
-            self.video_writer.write(frame)
+    def start_recording(self, slot, timestamp_ns, frame_info=None):
+        self.open_pending_writer((slot.shape[1], slot.shape[0]))
+        if self.video_writer is not None and slot.shape == self.slot_shape:
+            self.video_writer.write(slot)
+            self.timestamp_writer.write(timestamp_ns)
+            self.count_written_frame(timestamp_ns)
+            if frame_info is not None:
+                frame_info.mark(FRAME_MARK_RECORD_WRITTEN)
+        with self.event_condition:
+            self.release_slot(slot)
+
+    def write_jpeg(self, data, timestamp_ns, frame_info=None):
+        if self.video_writer is not None and self.video_writer.write(data, timestamp_ns):
+            self.count_written_frame(timestamp_ns)
+            if frame_info is not None:
+                frame_info.mark(FRAME_MARK_RECORD_WRITTEN)
+        with self.event_condition:
+            self.event_condition.notify_all()
+
+    def count_written_frame(self, timestamp_ns):
+        if self.file_first_timestamp is None:
+            self.file_first_timestamp = timestamp_ns
+        self.file_last_timestamp = timestamp_ns
+        self.written_frames += 1
+
+    def get_file_seconds(self):
+        if self.file_first_timestamp is None:
+            return 0.0
+        return (self.file_last_timestamp - self.file_first_timestamp) / 1e9
 
-    def stop_recording(self): 
+    def get_time_origin(self):
+        if self.is_passthrough():
+            return self.video_writer.get_time_origin()
+        return self.video_file, self.timestamp_writer.first_timestamp
+
+    def write_event(self, timestamp_ns, event_type, fields):
+        if self.video_writer is None:
+            return
+        path, first_timestamp = self.get_time_origin()
+        if self.event_writer is None or self.event_writer.path != path:
+            # A new AVI segment gets its own track, with times relative to its own first frame
+            if self.event_writer is not None:
+                self.event_writer.release()
+            self.event_writer = EventTrackWriter(path)
+            if self.session_info is not None and event_type != EVENT_TYPE_INFO:
+                self.event_writer.write(0.0, EVENT_TYPE_INFO, self.session_info)
+        seconds = (timestamp_ns - first_timestamp) / 1e9 if first_timestamp is not None else 0.0
+        self.event_writer.write(seconds, event_type, fields)
+
+    def stop_recording(self, min_seconds=0):
+        with self.event_condition:
+            # The slot pool is only held while recording, a recording started after this stop keeps its pool
+            if not self.recording:
+                self.slot_shape = None
+                self.free_slots = []
+        self.writer_pending = False
         if self.video_writer is not None:
-            self.video_writer.release()
-            self.video_writer = None
-            self.video_file = None
-            self.update_file_name(self.file_name)
\ No newline at end of file
+            too_short = self.get_file_seconds() < min_seconds
+            file_names = self.close_writer()
+            if too_short:
+                self.delete_files(file_names)
+            else:
+                self.finish_files(file_names)
+
+    def cut_clip(self, suffix):
+        if self.video_writer is None:
+            return
+        empty = self.file_first_timestamp is None
+        file_names = self.close_writer()
+        if empty:
+            self.delete_files(file_names)
+        else:
+            self.finish_files(self.rename_files(file_names, suffix))
+        self.open_writer()
+
+    def close_writer(self):
+        self.video_writer.release()
+        if self.timestamp_writer is not None:
+            self.timestamp_writer.release()
+            self.timestamp_writer = None
+        if self.event_writer is not None:
+            self.event_writer.release()
+            self.event_writer = None
+        file_names = [self.file_name]
+        if self.is_passthrough():
+            # Long AVI recordings are split into segments
+            file_names = list(self.video_writer.file_names)
+        self.video_writer = None
+        self.video_file = None
+        return file_names
+
+    def finish_files(self, file_names):
+        if not file_names:
+            return
+        self.file_name = ", ".join(file_names)
+        self.update_file_name(self.file_name)
+        self.update_catalog(file_names)
+
+    def get_sidecar_paths(self, path):
+        # Includes the frame index and thumbnail caches the player builds next to the video
+        return [path] + [path + suffix for suffix in (TIMESTAMP_SUFFIX, STREAM_INDEX_SUFFIX, EVENT_TRACK_SUFFIX,
+                                                      VIDEO_INDEX_SUFFIX, THUMBNAIL_CACHE_SUFFIX)]
+
+    def rename_files(self, file_names, suffix):
+        # Sidecars keep their video's name, so the renamed file still plays with its timestamps and events
+        renamed = []
+        for file_name in file_names:
+            root, extension = os.path.splitext(file_name)
+            new_name = f"{root}_{suffix}{extension}"
+            for old_path, new_path in zip(self.get_sidecar_paths(os.path.join(self.directory, file_name)),
+                                          self.get_sidecar_paths(os.path.join(self.directory, new_name))):
+                if os.path.exists(old_path):
+                    try:
+                        os.replace(old_path, new_path)
+                    except OSError as e:
+                        print(f"Could not rename {old_path}: {e}")
+            renamed.append(new_name if os.path.exists(os.path.join(self.directory, new_name)) else file_name)
+        return renamed
+
+    def delete_files(self, file_names):
+        for file_name in file_names:
+            for path in self.get_sidecar_paths(os.path.join(self.directory, file_name)):
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        print(f"Could not delete {path}: {e}")
+
+    def update_catalog(self, file_names):
+        try:
+            RecordingCatalog(self.directory).update_recordings(file_names)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not update the recording catalog: {e}")
+
+    def write_pre_event_frames(self, frames):
+        if self.video_writer is None and not self.writer_pending:
+            return
+        for data, timestamp_ns in frames:
+            if self.is_passthrough():
+                self.video_writer.write(data, timestamp_ns)
+            else:
+                # Re-encode mode only decodes the buffered frames once they are actually recorded
+                image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    continue
+                self.open_pending_writer((image.shape[1], image.shape[0]))
+                if (image.shape[1], image.shape[0]) != self.frame_size:
+                    image = cv2.resize(image, self.frame_size)
+                self.video_writer.write(image)
+                self.timestamp_writer.write(timestamp_ns)
+            self.count_written_frame(timestamp_ns)
+
+    def save_replay(self, frames, timestamp_ns, event_type, fields):
+        # The buffer already holds JPEGs, so replays are written pass-through whatever the record mode
+        file_name = self.get_new_file_name(REPLAY_FILE_PREFIX)
+        path = os.path.join(self.directory, file_name)
+        writer = self.create_jpeg_writer(path)
+        for data, frame_timestamp_ns in frames:
+            writer.write(data, frame_timestamp_ns)
+        writer.release()
+        event_writer = EventTrackWriter(path)
+        if self.session_info is not None:
+            event_writer.write(0.0, EVENT_TYPE_INFO, self.session_info)
+        event_writer.write((timestamp_ns - frames[0][1]) / 1e9, event_type, fields)
+        event_writer.release()
+        # The recording's own file_name is left alone, close_writer still needs it
+        self.update_file_name(", ".join(writer.file_names))
+        self.update_catalog(writer.file_names)
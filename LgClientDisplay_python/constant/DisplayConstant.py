@@ -19,14 +19,22 @@ MENUBAR_HEIGHT = 23
 MENUBAR_OBJECT_NAME = "menubar"
 MENUFILE_OBJECT_NAME = "menuFile"
 MENUHELP_OBJECT_NAME = "menuHelp"
+MENUVIEW_OBJECT_NAME = "menuView"
 MENUFILE_TEXT = "File"
 MENUHELP_TEXT = "Help"
+MENUVIEW_TEXT = "View"
 MENUEXIT_TEXT = "Exit"
 MENUABOUT_TEXT = "About"
 MENUACONFIG_TEXT = "Pre-Arm Config"
+MENUFRAME_STATS_TEXT = "Frame Latency Stats"
+MENUDUMP_FRAME_STATS_TEXT = "Dump Frame Stats"
+MENUPERFORMANCE_HUD_TEXT = "Performance HUD"
 ACTION_EXIT = "Exit"
 ACTION_ABOUT = "About"
 ACTION_CONFIG= "Config"
+ACTION_FRAME_STATS = "Frame Latency Stats"
+ACTION_DUMP_FRAME_STATS = "Dump Frame Stats"
+ACTION_PERFORMANCE_HUD = "Performance HUD"
 
 STATUS_BAR_OBJECT_NAME = "statusbar"
 
@@ -205,6 +213,22 @@ NONEDIT_TEXT_LOG_TOP = 750
 NONEDIT_TEXT_LOG_WIDTH = 300
 NONEDIT_TEXT_LOG_HEIGHT = 105
 NONEDIT_TEXT_LOG_OBJECT_NAME = "nonEditText_log"
+LOG_MAX_MESSAGES = 1000
+
+LOG_LEVEL_NORMAL = "normal"
+LOG_LEVEL_EMPHASIS = "emphasis"
+LOG_LEVEL_ERROR = "error"
+LOG_LEVEL_SERVER = "server"
+LOG_LEVEL_SERVER_ERROR = "server_error"
+LOG_LEVEL_LIST = [LOG_LEVEL_NORMAL, LOG_LEVEL_EMPHASIS, LOG_LEVEL_ERROR, LOG_LEVEL_SERVER, LOG_LEVEL_SERVER_ERROR]
+LOG_SOURCE_CLIENT = "client"
+LOG_SOURCE_SERVER = "server"
+
+# Session Log File
+SESSION_LOG_FILE_LOCATION = "LogFiles"
+SESSION_LOG_MAX_FILE_BYTES = 5 * 1024 * 1024
+SESSION_LOG_BATCH_SIZE = 200
+SESSION_LOG_FLUSH_INTERVAL = 0.5
 
 # Video Panel
 GROUPBOX_CAMERA_VIDEO_TITLE = "Camera Video"
@@ -227,6 +251,25 @@ LABEL_CAMERA_VIDEO_OBJECT_NAME = "label_camera_video"
 OVERLAY_RECORD_ICON = "./resources/record.png"
 OVERLAY_RECORD_ICON_PADDING = 20
 
+RENDER_MAX_FPS = 60
+
+# Draw camera frames through OpenGL, falls back to the QLabel pixmap path when no context can be created
+# or the GL surface fails to initialize
+VIDEO_SURFACE_OPENGL = False
+# Force Mesa llvmpipe (opengl32sw on Windows) for machines without a usable GPU driver
+VIDEO_SURFACE_SOFTWARE_GL = False
+
+# Per-frame latency instrumentation, toggled from the View menu
+FRAME_METRICS_ENABLED = False
+FRAME_METRICS_WINDOW = 600
+FRAME_METRICS_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500]
+FRAME_STATS_OVERLAY_INTERVAL_MS = 500
+FRAME_STATS_OVERLAY_MARGIN = 10
+PERFORMANCE_HUD_INTERVAL_MS = 500
+PERFORMANCE_HUD_MARGIN = 10
+PERFORMANCE_HUD_WAITING_TEXT = "collecting..."
+FRAME_STATS_SPARKLINE = " \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+
 # Algorithm Panel
 GROUPBOX_ALGORITHM_TITLE = "Algorithm"
 GROUPBOX_ALGORITHM_OBJECT_NAME = "groupBox_algorithm"
@@ -313,6 +356,30 @@ BORDER_COLOR = "red"
 # Dialog Video Player
 DIALOG_VIDEO_PLAYER_TITLE = "Video Player"
 DIALOG_VIDEO_FILE_LOCATION = "RecordFiles"
+# Video Player playback, frames decoded ahead of the clock and how often an empty buffer is polled
+PLAYER_READ_AHEAD_FRAMES = 8
+PLAYER_IDLE_POLL_MS = 5
+# Above the display rate, playback decodes only the frames it will show
+PLAYER_SPEED_LIST = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0]
+PLAYER_DEFAULT_SPEED = 1.0
+PLAYER_MAX_DISPLAY_FPS = 60
+PLAYER_FRAME_CACHE_MB = 256
+# Video Player timeline, thumbnails are built in the background and cached next to the recording
+PLAYER_THUMBNAIL_COUNT = 20
+PLAYER_THUMBNAIL_HEIGHT = 54
+PLAYER_EVENT_MARKER_SNAP_PX = 4
+PLAYER_EVENT_COLOR_HIT = "lime"
+PLAYER_EVENT_COLOR_MISS = "red"
+PLAYER_EVENT_COLOR_STATE = "deepskyblue"
+
+# Recording library, a SQLite catalog in DIALOG_VIDEO_FILE_LOCATION updated as recordings finish
+RECORD_CATALOG_FILE_NAME = "catalog.sqlite3"
+RECORD_VIDEO_EXTENSION_LIST = [".avi", ".mp4", ".mkv", ".mjpg"]
+DIALOG_LIBRARY_TITLE = "Recordings"
+LIBRARY_SEARCH_PLACEHOLDER = "Search file, date, target order or algorithm"
+LIBRARY_BROWSE_TEXT = "Browse..."
+LIBRARY_OPEN_TEXT = "Open"
+LIBRARY_COLUMN_LIST = ["Recorded", "File", "Duration", "Frames", "Resolution", "Targets", "Hits", "Misses", "Algorithm"]
 
 # Record & Play
 GROUPBOX_RECORD_PLAY_TITLE = "Record"
@@ -322,6 +389,40 @@ BUTTON_PLAY_ICON_PATH = "./resources/video-player.gif"
 BUTTON_RECORD_ICON_WIDTH = 40
 BUTTON_RECORD_ICON_HEIGHT = 40
 
+# Video Recorder, pass-through modes store the received JPEG bytes without decoding or re-encoding
+RECORD_MODE_REENCODE = "reencode"
+RECORD_MODE_MJPEG_AVI = "mjpeg_avi"
+RECORD_MODE_RAW_STREAM = "raw_stream"
+RECORD_MODE_LIST = [RECORD_MODE_REENCODE, RECORD_MODE_MJPEG_AVI, RECORD_MODE_RAW_STREAM]
+RECORD_MODE = RECORD_MODE_MJPEG_AVI
+RECORD_FPS = 35.0
+RECORD_RAW_STREAM_EXTENSION = ".mjpg"
+
+# Video Recorder queue, frames beyond RECORD_QUEUE_SIZE are handled by RECORD_QUEUE_POLICY
+RECORD_POLICY_DROP_OLDEST = "drop_oldest"
+RECORD_POLICY_DROP_NEWEST = "drop_newest"
+RECORD_POLICY_BLOCK = "block"
+RECORD_POLICY_LIST = [RECORD_POLICY_DROP_OLDEST, RECORD_POLICY_DROP_NEWEST, RECORD_POLICY_BLOCK]
+RECORD_QUEUE_SIZE = 16
+RECORD_QUEUE_POLICY = RECORD_POLICY_DROP_OLDEST
+# Longest a decode thread waits for a free slot under the block policy before the frame is dropped.
+# Pass-through JPEGs are enqueued from the socket reader and are dropped at once instead.
+RECORD_BLOCK_TIMEOUT_SEC = 1.0
+
+# Pre-event buffer, the last received JPEGs kept while not recording. Flushed ahead of a new
+# recording, or saved as a replay clip when a hit/miss arrives. 0 seconds disables it.
+PRE_EVENT_BUFFER_SEC = 30
+PRE_EVENT_BUFFER_MAX_MB = 48
+RECORD_FILE_PREFIX = "video"
+REPLAY_FILE_PREFIX = "replay"
+
+# Auto-engage clips, recorded from entering auto-engage until Safe or Pre-Arm and cut at every
+# hit/miss into one file per target. A last clip shorter than AUTO_CLIP_MIN_SEC is discarded.
+AUTO_RECORD_ENABLED = True
+AUTO_CLIP_FILE_PREFIX = "engage"
+AUTO_CLIP_TARGET_SUFFIX = "target"
+AUTO_CLIP_MIN_SEC = 1.0
+
 # Hit & Miss
 HIT_TEXT = "[Hit]"
 MISS_TEXT = "[Miss]"
\ No newline at end of file
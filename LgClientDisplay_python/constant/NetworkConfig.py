@@ -1,4 +1,8 @@
 REMOTE_PORT_NUM = 5000
+CONNECT_TIMEOUT_SEC = 3
+
+# Use the asyncio transport (AsyncTcpSendReceiver) instead of the threaded TcpSendReceiver
+NETWORK_TRANSPORT_ASYNCIO = False
 
 # Send Type
 MT_COMMANDS = 1
@@ -17,4 +21,14 @@ MT_STATE = 6
 
 NETWORK_CONNECTED = 0
 NETWORK_DISCONNECTED = 1
-NETWORK_CONNECTING = 2
\ No newline at end of file
+NETWORK_CONNECTING = 2
+
+# Receive Buffer, a recv is never issued with less free space than RECV_BUFFER_MIN_FREE
+MSG_HEADER_SIZE = 8
+RECV_BUFFER_INITIAL_SIZE = 64 * 1024
+RECV_BUFFER_MIN_FREE = 4 * 1024
+
+# Send Buffer, messages queued while the previous write was in progress are packed into it
+SEND_BUFFER_INITIAL_SIZE = 4 * 1024
+# Unsent bytes allowed to pile up while the server is not reading, further messages are refused
+SEND_BUFFER_MAX_BYTES = 64 * 1024
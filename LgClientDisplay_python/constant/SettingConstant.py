@@ -32,6 +32,8 @@ PAN_RIGHT_STOP = 0xFD
 PAN_UP_STOP = 0xFB
 PAN_DOWN_STOP = 0xF7
 FIRE_STOP = 0xEF
+PAN_FIRE_START_LIST = [PAN_LEFT_START, PAN_RIGHT_START, PAN_UP_START, PAN_DOWN_START, FIRE_START]
+PAN_FIRE_STOP_LIST = [PAN_LEFT_STOP, PAN_RIGHT_STOP, PAN_UP_STOP, PAN_DOWN_STOP, FIRE_STOP]
 
 # Calibration
 DEC_X = 0x01
@@ -59,4 +61,13 @@ CONFIG_ID_CV_AREA_MAX = "CV_AREA_MAX"
 CONFIG_ID_TF_T1 = "TF_THRESHOLD1"
 CONFIG_ID_TF_T2 = "TF_THRESHOLD2"
 CONFIG_ID_TF_EPSILON = "TF_EPSILON"   
-CONFIG_ID_TF_DY_MV = "TF_DY_MV"
\ No newline at end of file
+CONFIG_ID_TF_DY_MV = "TF_DY_MV"
+
+# Controller event lanes, lower value is dispatched first
+EVENT_LANE_SAFETY = 0
+EVENT_LANE_MOTION = 1
+EVENT_LANE_CONFIG = 2
+EVENT_LANE_BOOKKEEPING = 3
+EVENT_LANE_LIST = [EVENT_LANE_SAFETY, EVENT_LANE_MOTION, EVENT_LANE_CONFIG, EVENT_LANE_BOOKKEEPING]
+EVENT_LANE_NAMES = {EVENT_LANE_SAFETY: "safety", EVENT_LANE_MOTION: "motion",
+                    EVENT_LANE_CONFIG: "config", EVENT_LANE_BOOKKEEPING: "bookkeeping"}
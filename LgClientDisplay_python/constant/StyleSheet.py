@@ -145,4 +145,8 @@ VIDEO_PLAYER_PROGRESS_STYLE = "border: 2px solid grey;"
 
 LABEL_CAMERA_STYLE = "background-color: black; color: white; border-radius: 10px"
 
-OVERLAY_STYLE = "background: transparent;"
\ No newline at end of file
+OVERLAY_STYLE = "background: transparent;"
+
+FRAME_STATS_OVERLAY_STYLE = "background-color: rgba(0, 0, 0, 160); color: white; padding: 6px; border-radius: 6px;"
+
+PERFORMANCE_HUD_STYLE = "background-color: rgba(0, 0, 0, 140); color: #7CFC00; padding: 4px; border-radius: 4px;"
@@ -0,0 +1,136 @@
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+GL_COLOR_BUFFER_BIT = 0x00004000
+GL_TRIANGLE_STRIP = 0x0005
+
+VERTEX_SHADER = """
+attribute highp vec2 position;
+attribute highp vec2 texCoord;
+varying mediump vec2 uv;
+void main() {
+    uv = texCoord;
+    gl_Position = vec4(position, 0.0, 1.0);
+}
+"""
+
+# Frames are uploaded as BGR bytes, the swizzle restores RGB while sampling
+FRAGMENT_SHADER = """
+#ifdef GL_ES
+precision mediump float;
+#endif
+varying mediump vec2 uv;
+uniform sampler2D frame;
+void main() {
+    gl_FragColor = vec4(texture2D(frame, uv).bgr, 1.0);
+}
+"""
+
+QUAD_VERTICES = [QtGui.QVector2D(-1, -1), QtGui.QVector2D(1, -1), QtGui.QVector2D(-1, 1), QtGui.QVector2D(1, 1)]
+QUAD_TEX_COORDS = [QtGui.QVector2D(0, 1), QtGui.QVector2D(1, 1), QtGui.QVector2D(0, 0), QtGui.QVector2D(1, 0)]
+
+class GlVideoWidget(QtWidgets.QOpenGLWidget):
+    # Emitted when the context has no usable function table or the shader does not link,
+    # the owner swaps in the QLabel surface. Nothing is drawn after a failure.
+    initializationFailed = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(GlVideoWidget, self).__init__(parent)
+        self.gl = None
+        self.failed = False
+        self.program = None
+        self.texture = None
+        self.frame = None
+        self.frame_dirty = False
+        self.transfer_options = QtGui.QOpenGLPixelTransferOptions()
+        self.transfer_options.setAlignment(1)
+
+    @staticmethod
+    def is_available():
+        context = QtGui.QOpenGLContext()
+        return context.create()
+
+    def set_frame(self, frame):
+        self.frame = np.ascontiguousarray(frame)
+        self.frame_dirty = True
+        self.update()
+
+    def clear(self):
+        self.frame = None
+        self.frame_dirty = False
+        self.update()
+
+    def initializeGL(self):
+        versionProfile = None
+        if not self.context().isOpenGLES():
+            versionProfile = QtGui.QOpenGLVersionProfile()
+            versionProfile.setVersion(2, 0)
+        # None for GLES contexts and for profiles the context cannot provide
+        self.gl = self.context().versionFunctions(versionProfile)
+        if self.gl is None or not self.gl.initializeOpenGLFunctions():
+            self.fail("No OpenGL 2.0 function table for the video surface")
+            return
+
+        self.program = QtGui.QOpenGLShaderProgram(self)
+        self.program.addShaderFromSourceCode(QtGui.QOpenGLShader.Vertex, VERTEX_SHADER)
+        self.program.addShaderFromSourceCode(QtGui.QOpenGLShader.Fragment, FRAGMENT_SHADER)
+        self.program.bindAttributeLocation("position", 0)
+        self.program.bindAttributeLocation("texCoord", 1)
+        if not self.program.link():
+            self.fail(f"Error linking video shader: {self.program.log()}")
+            return
+        # A texture created in a previous context cannot be reused
+        self.texture = None
+        self.frame_dirty = self.frame is not None
+        self.context().aboutToBeDestroyed.connect(self.cleanupGL)
+
+    def fail(self, message):
+        print(message)
+        self.gl = None
+        self.failed = True
+        self.initializationFailed.emit()
+
+    def cleanupGL(self):
+        self.makeCurrent()
+        if self.texture is not None:
+            self.texture.destroy()
+            self.texture = None
+        self.doneCurrent()
+
+    def upload_frame(self):
+        # The texture is only reallocated when the frame size changes, otherwise its storage is refilled
+        height, width = self.frame.shape[:2]
+        if self.texture is None or self.texture.width() != width or self.texture.height() != height:
+            if self.texture is not None:
+                self.texture.destroy()
+            self.texture = QtGui.QOpenGLTexture(QtGui.QOpenGLTexture.Target2D)
+            self.texture.setSize(width, height)
+            self.texture.setFormat(QtGui.QOpenGLTexture.RGB8_UNorm)
+            self.texture.setMinMagFilters(QtGui.QOpenGLTexture.Linear, QtGui.QOpenGLTexture.Linear)
+            self.texture.setWrapMode(QtGui.QOpenGLTexture.ClampToEdge)
+            self.texture.allocateStorage(QtGui.QOpenGLTexture.RGB, QtGui.QOpenGLTexture.UInt8)
+        self.texture.setData(QtGui.QOpenGLTexture.RGB, QtGui.QOpenGLTexture.UInt8, self.frame, self.transfer_options)
+        self.frame_dirty = False
+
+    def paintGL(self):
+        if self.failed:
+            return
+        self.gl.glClearColor(0.0, 0.0, 0.0, 1.0)
+        self.gl.glClear(GL_COLOR_BUFFER_BIT)
+        if self.frame is None:
+            return
+        if self.frame_dirty:
+            self.upload_frame()
+
+        self.program.bind()
+        self.texture.bind(0)
+        self.program.setUniformValue("frame", 0)
+        self.program.enableAttributeArray(0)
+        self.program.enableAttributeArray(1)
+        self.program.setAttributeArray(0, QUAD_VERTICES)
+        self.program.setAttributeArray(1, QUAD_TEX_COORDS)
+        self.gl.glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+        self.program.disableAttributeArray(0)
+        self.program.disableAttributeArray(1)
+        self.texture.release()
+        self.program.release()
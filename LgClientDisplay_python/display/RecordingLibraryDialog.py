@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+from PyQt5 import QtCore, QtWidgets
+
+from constant.DisplayConstant import DIALOG_LIBRARY_TITLE, LIBRARY_SEARCH_PLACEHOLDER, LIBRARY_BROWSE_TEXT, LIBRARY_OPEN_TEXT, \
+                                    LIBRARY_COLUMN_LIST, RECORD_VIDEO_EXTENSION_LIST
+from RecordingCatalog import RecordingCatalog
+
+class RecordingLibraryDialog(QtWidgets.QDialog):
+    # Lists the catalog straight away, files added or changed behind its back are picked up by a background sync
+    syncFinished = QtCore.pyqtSignal(bool)
+
+    def __init__(self, directory, parent=None, openFilesCallback=None):
+        super(RecordingLibraryDialog, self).__init__(parent)
+        self.setWindowTitle(DIALOG_LIBRARY_TITLE)
+        self.resize(900, 500)
+        self.catalog = RecordingCatalog(directory)
+        self.directory = directory
+        self.selected_file = None
+        self.sync_thread = None
+        # Returns the names of the files the recorder is still writing
+        self.open_files_callback = openFilesCallback
+
+        self.search_edit = QtWidgets.QLineEdit(self)
+        self.search_edit.setPlaceholderText(LIBRARY_SEARCH_PLACEHOLDER)
+        self.table = QtWidgets.QTableWidget(0, len(LIBRARY_COLUMN_LIST), self)
+        self.table.setHorizontalHeaderLabels(LIBRARY_COLUMN_LIST)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.browse_button = QtWidgets.QPushButton(LIBRARY_BROWSE_TEXT, self)
+        self.open_button = QtWidgets.QPushButton(LIBRARY_OPEN_TEXT, self)
+
+        button_layout = QtWidgets.QHBoxLayout()
+        button_layout.addWidget(self.browse_button)
+        button_layout.addStretch(1)
+        button_layout.addWidget(self.open_button)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.table)
+        layout.addLayout(button_layout)
+
+        self.search_edit.textChanged.connect(self.refresh)
+        self.table.cellDoubleClicked.connect(self.open_selected)
+        self.open_button.clicked.connect(self.open_selected)
+        self.browse_button.clicked.connect(self.browse)
+        self.syncFinished.connect(self.finish_sync)
+
+    def showEvent(self, event):
+        super(RecordingLibraryDialog, self).showEvent(event)
+        self.selected_file = None
+        self.refresh()
+        self.start_sync()
+
+    def start_sync(self):
+        if self.sync_thread is not None and self.sync_thread.is_alive():
+            return
+        skip_file_names = set(self.open_files_callback()) if self.open_files_callback is not None else set()
+        self.sync_thread = threading.Thread(target=self.run_sync, args=(skip_file_names,), daemon=True)
+        self.sync_thread.start()
+
+    def run_sync(self, skip_file_names):
+        try:
+            changed = self.catalog.sync(skip_file_names)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not sync the recording catalog: {e}")
+            changed = False
+        self.syncFinished.emit(changed)
+
+    def finish_sync(self, changed):
+        if changed:
+            self.refresh()
+
+    def refresh(self):
+        try:
+            rows = self.catalog.search(self.search_edit.text().strip())
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not read the recording catalog: {e}")
+            return
+        self.table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            minutes, seconds = divmod(int(row["duration"]), 60)
+            values = [row["recorded_at"], row["file_name"], f"{minutes // 60:02}:{minutes % 60:02}:{seconds:02}",
+                      str(row["frame_count"]), f"{row['width']}x{row['height']}" if row["width"] else "",
+                      row["target_order"], str(row["hit_count"]), str(row["miss_count"]), row["algorithm"]]
+            for column, value in enumerate(values):
+                self.table.setItem(row_index, column, QtWidgets.QTableWidgetItem(value))
+        self.table.resizeColumnsToContents()
+
+    def open_selected(self):
+        row = self.table.currentRow()
+        if row < 0:
+            return
+        self.selected_file = os.path.join(self.directory, self.table.item(row, 1).text())
+        self.accept()
+
+    def browse(self):
+        patterns = " ".join(f"*{extension}" for extension in RECORD_VIDEO_EXTENSION_LIST)
+        file_name, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Open Video File", "", f"Video Files ({patterns})")
+        if file_name:
+            self.selected_file = file_name
+            self.accept()
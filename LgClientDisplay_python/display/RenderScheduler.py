@@ -0,0 +1,54 @@
+from PyQt5 import QtCore, QtGui
+
+class RenderScheduler(QtCore.QObject):
+    def __init__(self, renderCallback, maxFps, parent=None):
+        super(RenderScheduler, self).__init__(parent)
+        self.render_callback = renderCallback
+        self.max_fps = maxFps
+        self.pending_frame = None
+        self.pending_frame_info = None
+        self.submitted_frames = 0
+        self.rendered_frames = 0
+        self.dropped_frames = 0
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.timeout.connect(self.render_pending_frame)
+        self.timer.start(self.get_render_interval())
+
+    def get_render_interval(self):
+        # Tick once per display refresh, never faster than the configured cap
+        fps = self.max_fps
+        screen = QtGui.QGuiApplication.primaryScreen()
+        if screen is not None and screen.refreshRate() > 0:
+            fps = min(fps, screen.refreshRate())
+        return max(1, int(1000 / fps))
+
+    def set_max_fps(self, maxFps):
+        self.max_fps = maxFps
+        self.timer.setInterval(self.get_render_interval())
+
+    def submit(self, frame, frame_info=None):
+        # Only the newest frame is kept, anything not yet drawn is counted as dropped
+        if self.pending_frame is not None:
+            self.dropped_frames += 1
+        self.pending_frame = frame
+        self.pending_frame_info = frame_info
+        self.submitted_frames += 1
+
+    def render_pending_frame(self):
+        if self.pending_frame is None:
+            return
+        frame = self.pending_frame
+        frame_info = self.pending_frame_info
+        self.pending_frame = None
+        self.pending_frame_info = None
+        self.render_callback(frame, frame_info)
+        self.rendered_frames += 1
+
+    def clear(self):
+        self.pending_frame = None
+        self.pending_frame_info = None
+
+    def get_stats(self):
+        return self.submitted_frames, self.rendered_frames, self.dropped_frames
@@ -0,0 +1,76 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+from constant.DisplayConstant import PLAYER_EVENT_MARKER_SNAP_PX
+
+class SeekBar(QtWidgets.QProgressBar):
+    # Progress bar that can be clicked and dragged, values follow the mouse across the bar width.
+    # Event markers are drawn as ticks and a click close to one lands exactly on it.
+    scrubStarted = QtCore.pyqtSignal()
+    scrubMoved = QtCore.pyqtSignal(int)
+    scrubFinished = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(SeekBar, self).__init__(parent)
+        self.scrubbing = False
+        # (value, color name, tooltip)
+        self.markers = []
+        self.setMouseTracking(True)
+
+    def set_markers(self, markers):
+        self.markers = markers
+        self.update()
+
+    def get_value_at(self, x):
+        span = self.maximum() - self.minimum()
+        if span <= 0 or self.width() <= 0:
+            return self.minimum()
+        ratio = min(1.0, max(0.0, x / self.width()))
+        return self.minimum() + int(round(ratio * span))
+
+    def get_x_of(self, value):
+        span = self.maximum() - self.minimum()
+        if span <= 0:
+            return 0
+        return int(round((value - self.minimum()) / span * (self.width() - 1)))
+
+    def get_marker_at(self, x):
+        nearest = None
+        for marker in self.markers:
+            distance = abs(self.get_x_of(marker[0]) - x)
+            if distance <= PLAYER_EVENT_MARKER_SNAP_PX and (nearest is None or distance < nearest[0]):
+                nearest = (distance, marker)
+        return nearest[1] if nearest is not None else None
+
+    def paintEvent(self, event):
+        super(SeekBar, self).paintEvent(event)
+        if not self.markers:
+            return
+        painter = QtGui.QPainter(self)
+        for value, color, _ in self.markers:
+            x = self.get_x_of(value)
+            painter.setPen(QtGui.QPen(QtGui.QColor(color), 2))
+            painter.drawLine(x, 0, x, self.height())
+
+    def mousePressEvent(self, event):
+        if event.button() != QtCore.Qt.LeftButton or self.maximum() <= self.minimum():
+            super(SeekBar, self).mousePressEvent(event)
+            return
+        marker = self.get_marker_at(event.pos().x())
+        if marker is not None:
+            self.scrubStarted.emit()
+            self.scrubFinished.emit(marker[0])
+            return
+        self.scrubbing = True
+        self.scrubStarted.emit()
+        self.scrubMoved.emit(self.get_value_at(event.pos().x()))
+
+    def mouseMoveEvent(self, event):
+        if self.scrubbing:
+            self.scrubMoved.emit(self.get_value_at(event.pos().x()))
+            return
+        marker = self.get_marker_at(event.pos().x())
+        self.setToolTip(marker[2] if marker is not None else "")
+
+    def mouseReleaseEvent(self, event):
+        if self.scrubbing and event.button() == QtCore.Qt.LeftButton:
+            self.scrubbing = False
+            self.scrubFinished.emit(self.get_value_at(event.pos().x()))
@@ -0,0 +1,42 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+class ThumbnailStrip(QtWidgets.QWidget):
+    # Evenly spaced thumbnails across the recording, filled in as they are built, click to jump
+    thumbnailClicked = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(ThumbnailStrip, self).__init__(parent)
+        self.frame_indices = []
+        self.pixmaps = []
+
+    def set_frames(self, frameIndices):
+        self.frame_indices = list(frameIndices)
+        self.pixmaps = [None] * len(self.frame_indices)
+        self.update()
+
+    def set_thumbnail(self, slot, pixmap):
+        if 0 <= slot < len(self.pixmaps):
+            self.pixmaps[slot] = pixmap
+            self.update(self.get_cell_rect(slot))
+
+    def get_cell_rect(self, slot):
+        count = max(1, len(self.frame_indices))
+        left = self.width() * slot // count
+        right = self.width() * (slot + 1) // count
+        return QtCore.QRect(left, 0, right - left, self.height())
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtCore.Qt.black)
+        for slot, pixmap in enumerate(self.pixmaps):
+            if pixmap is None:
+                continue
+            cell = self.get_cell_rect(slot)
+            scaled = pixmap.scaled(cell.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+            painter.drawPixmap(cell.x() + (cell.width() - scaled.width()) // 2,
+                               cell.y() + (cell.height() - scaled.height()) // 2, scaled)
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton and self.frame_indices and self.width() > 0:
+            slot = min(len(self.frame_indices) - 1, event.pos().x() * len(self.frame_indices) // self.width())
+            self.thumbnailClicked.emit(self.frame_indices[slot])